@@ -1,45 +1,208 @@
-from fastapi import FastAPI, Request, Form, HTTPException
+from fastapi import FastAPI, Request, Response, Form, HTTPException, Query
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from fastapi.responses import HTMLResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
 
 from logger import Logger
 from db import *
-
-from json import load, loads
-from typing import Optional, List, Tuple
-
-import requests
+from services import BlogService
+from models import UserCreate, PostCreate, ReadFailed
+from pagination import encode_cursor, decode_cursor
+from ids import canonical
+from metrics import MetricsMiddleware, registry
+from compression import CompressionMiddleware
+from replicas import ReadYourWritesMiddleware, track_replica_reads
+from pages import PageCache, FragmentCache
+from assets import PrecompressedStaticFiles, load_manifest, static_url_for
+from conditional import make_etag, body_etag, validators, is_conditional, not_modified, not_modified_response
+
+from config import get_conf
+from asyncio import CancelledError, create_task, sleep as async_sleep
+from contextlib import asynccontextmanager
+from os import makedirs
+from time import perf_counter
+from typing import AsyncIterator, Dict, Optional, List, Tuple
+
+import orjson
 
 # imports
 
-conf = load(open("confs/conf.json", encoding="utf-8"))
+conf = get_conf()
 
-app = FastAPI()
-mariamanager = MariaConnection(
-    host=conf["db"]["conn"]["host"],
-    port=conf["db"]["conn"]["port"],
-    user=conf["db"]["conn"]["user"],
-    password=conf["db"]["conn"]["password"],
-    database=conf["db"]["conn"]["database"],
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # warm-up runs in the background, so /healthz answers while /readyz is still 503
+    app.state.ready = False
+    task = create_task(_warm_up())
+
+    try:
+        yield
+    finally:
+        app.state.ready = False
+        task.cancel()
+        try:
+            await task
+        except CancelledError:
+            pass
+
+        mariamanager.shutdown()
+        mariamanager.connection.pool.close()
+        mariamanager.connection.replicas.close()
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+app.state.ready = False
+mariamanager = AsyncMariaConnection(
+    connection=MariaConnection(
+        host=conf["db"]["conn"]["host"],
+        port=conf["db"]["conn"]["port"],
+        user=conf["db"]["conn"]["user"],
+        password=conf["db"]["conn"]["password"],
+        database=conf["db"]["conn"]["database"],
+        pool=conf["db"]["pool"],
+        cache=conf["db"]["cache"],
+        transaction=conf["db"]["transaction"],
+        backend=conf["db"]["backend"],
+        sqlite=conf["db"]["sqlite"],
+        uuid_version=conf["db"]["uuid_version"],
+        replicas=conf["db"]["replicas"],
+        replication=conf["db"]["replication"],
+    ),
+    workers=conf["db"]["executor"]["workers"],
 )
 
-logger = Logger(filepath=conf["logger"]["app"])
+logger = Logger(filepath=conf["logger"]["app"], **conf["logger"]["settings"])
 
-templates = Jinja2Templates(directory=conf["fastapi"]["templates"])
-static = StaticFiles(directory=conf["fastapi"]["static"])
+# compiled templates are kept on disk, so a new worker loads them instead of compiling
+makedirs(conf["fastapi"]["bytecode_cache"], exist_ok=True)
+templates = Jinja2Templates(env=Environment(
+    loader=FileSystemLoader(conf["fastapi"]["templates"]),
+    autoescape=True,
+    bytecode_cache=FileSystemBytecodeCache(conf["fastapi"]["bytecode_cache"])
+))
+
+post_cards = FragmentCache(templates.env, "posts", "_post_card.html", "post", **conf["fastapi"]["fragment_cache"])
+templates.env.globals["post_card"] = post_cards
+# url_for('static', ...) points to the hashed copies made by `python3 assets.py`
+templates.env.globals["url_for"] = static_url_for(load_manifest(conf["fastapi"]["static"]))
+static = PrecompressedStaticFiles(directory=conf["fastapi"]["static"])
+
+page_cache = PageCache(**conf["fastapi"]["page_cache"])
+mariamanager.connection.on_change(page_cache.invalidate_table)
+mariamanager.connection.on_change(post_cards.invalidate_table)
 
 app.mount("/static", static, name="static")
+if conf["db"]["replicas"]:
+    app.add_middleware(ReadYourWritesMiddleware, sticky_seconds=conf["db"]["replication"]["sticky_seconds"])
+app.add_middleware(CompressionMiddleware, **conf["fastapi"]["compression"])
+app.add_middleware(MetricsMiddleware, registry=registry)
+
+registry.stats_collector("blog_db_pool", "Connection pool", mariamanager.connection.pool_stats)
+registry.stats_collector("blog_db_replica", "Read replicas", mariamanager.connection.replica_stats, label="replica")
+registry.stats_collector("blog_cache", "get_user/get_post cache", mariamanager.connection.cache_stats, label="cache")
+registry.stats_collector("blog_page_cache", "Rendered page cache", page_cache.stats)
+registry.stats_collector("blog_fragment_cache", "Rendered post card cache", post_cards.stats)
+registry.stats_collector("blog_logger", "Logger", lambda: {"app": logger.stats(), "db": db_logger.stats()}, label="logger")
+
+page_size = conf["api"]["page_size"]
+max_page_size = conf["api"]["max_page_size"]
+max_batch_size = conf["api"]["max_batch_size"]
+
+blog = BlogService(mariamanager=mariamanager, page_size=page_size)
 
 # configures
 
+def _parse_cursor(after: Optional[str]):
+    if after is None:
+        return None
+
+    try:
+        return decode_cursor(after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _wants_stream(request: Request, stream: bool) -> bool:
+    return stream or "application/x-ndjson" in request.headers.get("accept", "")
+
+async def _ndjson(chunks) -> AsyncIterator[bytes]:
+    async for chunk in mariamanager.iterate(chunks):
+        yield b"".join(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in chunk)
+
+def _ndjson_response(chunks) -> StreamingResponse:
+    return StreamingResponse(_ndjson(chunks), media_type="application/x-ndjson")
+
+def _check_batch(items: list) -> None:
+    if not items:
+        raise HTTPException(status_code=400, detail="Empty batch")
+    if len(items) > max_batch_size:
+        raise HTTPException(status_code=400, detail=f"Batch is bigger than {max_batch_size} items")
+
+def _next_page_headers(request: Request, next_key, limit: int) -> Dict[str, str]:
+    if next_key is None:
+        return {}
+
+    cursor = encode_cursor(*next_key)
+    next_url = request.url.include_query_params(limit=limit, after=cursor)
+
+    return {
+        "X-Next-Cursor": cursor,
+        "Link": f'<{next_url}>; rel="next"'
+    }
+
+def _conditional_json(request: Request, content, headers: Dict[str, str]) -> Response:
+    # listings have no single version, the etag is the hash of the serialized page. There is no
+    # Last-Modified: a deleted row or an older one moving into the page doesn't raise max(updatedAt)
+    response = ORJSONResponse(content, headers=headers)
+    validator_headers = validators(body_etag(response.body))
+
+    if not_modified(request, validator_headers["ETag"]):
+        return not_modified_response({**headers, **validator_headers})
+
+    response.headers.update(validator_headers)
+    return response
+
+async def _check_version(request: Request, kind: str, id: str, lookup) -> Optional[Response]:
+    # answers a conditional request from updatedAt alone, without reading the row itself
+    if not is_conditional(request):
+        return None
+
+    id = canonical(id)
+    if id is None:
+        return None
+
+    updated_at = await lookup(id)
+    if updated_at is None:
+        return None
+
+    headers = validators(make_etag(kind, id, updated_at), updated_at)
+    if not_modified(request, headers["ETag"], updated_at):
+        return not_modified_response(headers)
+
+    return None
+
 @app.get("/api/users")
-async def all_users(request: Request) -> Tuple[List[User], int]:
+async def all_users(
+        request: Request,
+        limit: int = Query(default=page_size, ge=1, le=max_page_size),
+        after: Optional[str] = None,
+        stream: bool = False,
+        compact: bool = False
+    ) -> Tuple[List[User], int]:
+
+    if _wants_stream(request, stream):
+        return _ndjson_response(mariamanager.connection.stream_users())
+
+    key = _parse_cursor(after)
+
     try:
-        users = mariamanager.get_users()
-        if users and users[0] == "404":
-            return [], 404
-        return users, 200
+        users, next_key = await mariamanager.get_users_page(limit=limit, after=key, compact=compact)
+        if users == ["400"]:
+            return [], 500
+        # listings are records or compact tuples that orjson serializes directly, so they skip jsonable_encoder
+        return _conditional_json(
+            request,
+            [users, 200],
+            _next_page_headers(request, next_key, limit)
+        )
     except Exception as e:
         logger.log(status="e", message=f"Error getting users: {e}")
         return [], 500
@@ -47,10 +210,21 @@ async def all_users(request: Request) -> Tuple[List[User], int]:
 @app.get("/api/users/{id}")
 async def get_user(request: Request, id: str) -> List[User]:
     try:
-        data = mariamanager.get_user(id)
+        unchanged = await _check_version(request, "user", id, mariamanager.get_user_version)
+        if unchanged is not None:
+            return unchanged
+
+        data = await mariamanager.get_user(id)
         if data and data[0] == "404":
             raise HTTPException(status_code=404, detail="User not found")
-        return data
+        if data and data[0] == "400":
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+        headers = validators(make_etag("user", data[0]["id"], data[0]["updatedAt"]), data[0]["updatedAt"])
+        if not_modified(request, headers["ETag"], data[0]["updatedAt"]):
+            return not_modified_response(headers)
+
+        return ORJSONResponse(data, headers=headers)
     except HTTPException:
         raise
     except Exception as e:
@@ -66,7 +240,7 @@ async def put_user(
     ) -> Tuple[str, int]:
 
     try:
-        status = mariamanager.create_user(
+        status = await mariamanager.create_user(
             email=email,
             login=login,
             password_unhashed=password
@@ -82,6 +256,17 @@ async def put_user(
         logger.log(status="e", message=f"Error creating user: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.post("/api/users:batch")
+async def batch_users(request: Request, users: List[UserCreate]):
+    _check_batch(users)
+
+    try:
+        results = await mariamanager.create_users([user.model_dump() for user in users])
+        return ORJSONResponse([results, 200])
+    except Exception as e:
+        logger.log(status="e", message=f"Error creating users batch: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @app.patch("/api/users/{id}")
 async def patch_user(
         request: Request,
@@ -92,26 +277,15 @@ async def patch_user(
     ):
 
     try:
-        user_info = mariamanager.get_user(id)
-        if not user_info or user_info[0] == "404":
-            raise HTTPException(status_code=404, detail="User not found")
-
-        current_info = user_info[0]
-        
-        if email is not None:
-            current_info["email"] = email
-        if login is not None:
-            current_info["login"] = login
-        if password is not None:
-            current_info["password"] = password
-
-        update_status = mariamanager.update_user(
+        update_status = await mariamanager.update_user(
             id=id,
-            login=current_info["login"],
-            email=current_info["email"],
-            password_unhashed=current_info["password"]
+            login=login,
+            email=email,
+            password_unhashed=password
         )
 
+        if update_status and update_status[0] == "404":
+            raise HTTPException(status_code=404, detail="User not found")
         if update_status and update_status[0] == "400":
             raise HTTPException(status_code=400, detail="Bad Request")
 
@@ -127,12 +301,10 @@ async def patch_user(
 @app.delete("/api/users/{id}")
 async def delete_user(request: Request, id: str):
     try:
-        user_info = mariamanager.get_user(id)
-        if not user_info or user_info[0] == "404":
-            raise HTTPException(status_code=404, detail="User not found")
-
-        delete_status = mariamanager.delete_user(id=id)
+        delete_status = await mariamanager.delete_user(id=id)
 
+        if delete_status and delete_status[0] == "404":
+            raise HTTPException(status_code=404, detail="User not found")
         if delete_status and delete_status[0] == "400":
             raise HTTPException(status_code=400, detail="Bad Request")
 
@@ -145,10 +317,30 @@ async def delete_user(request: Request, id: str):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @app.get("/api/posts")
-async def get_posts(request: Request):
+async def get_posts(
+        request: Request,
+        limit: int = Query(default=page_size, ge=1, le=max_page_size),
+        after: Optional[str] = None,
+        stream: bool = False,
+        compact: bool = False
+    ):
+
+    if _wants_stream(request, stream):
+        return _ndjson_response(mariamanager.connection.stream_posts())
+
+    key = _parse_cursor(after)
+
     try:
-        posts = mariamanager.get_posts()
-        return posts
+        posts, next_key = await mariamanager.get_posts_page(limit=limit, after=key, compact=compact)
+        if posts == ["400"]:
+            raise HTTPException(status_code=500, detail="Internal server error")
+        return _conditional_json(
+            request,
+            posts,
+            _next_page_headers(request, next_key, limit)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.log(status="e", message=f"Error getting posts: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -157,41 +349,27 @@ async def get_posts(request: Request):
 @app.get("/api/posts/{id}")
 async def get_post(request: Request, id: str):
     try:
-        data = mariamanager.get_post(id)
+        unchanged = await _check_version(request, "post", id, mariamanager.get_post_version)
+        if unchanged is not None:
+            return unchanged
+
+        data = await mariamanager.get_post(id)
+        if data and data[0] == "400":
+            raise HTTPException(status_code=500, detail="Internal server error")
         if data and data[0] == "404":
             raise HTTPException(status_code=404, detail="Post not found")
-        return data
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.log(status="e", message=f"Error getting post {id}: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
 
-@app.get("/api/users")
-async def all_users(request: Request) -> Tuple[List[User], int]:
-    try:
-        users = mariamanager.get_users()
-        if users and users[0] == "404":
-            return [], 404
-        return users, 200
-    except Exception as e:
-        logger.log(status="e", message=f"Error getting users: {e}")
-        return [], 500
+        headers = validators(make_etag("post", data[0]["id"], data[0]["updatedAt"]), data[0]["updatedAt"])
+        if not_modified(request, headers["ETag"], data[0]["updatedAt"]):
+            return not_modified_response(headers)
 
-@app.get("/api/users/{id}")
-async def get_user(request: Request, id: str) -> List[User]:
-    try:
-        data = mariamanager.get_post(id)
-        if data and data[0] == "404":
-            raise HTTPException(status_code=404, detail="Post not found")
-        return data
+        return ORJSONResponse(data, headers=headers)
     except HTTPException:
         raise
     except Exception as e:
         logger.log(status="e", message=f"Error getting post {id}: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-
 @app.put("/api/posts")
 async def put_post(
         request: Request,
@@ -201,17 +379,14 @@ async def put_post(
     ) -> Tuple[str, int]:
 
     try:
-        # Check if author exists
-        author_info = mariamanager.get_user(authorId)
-        if not author_info or author_info[0] == "404":
-            raise HTTPException(status_code=400, detail="Author does not exist")
-
-        status = mariamanager.create_post(
+        status = await mariamanager.create_post(
             author_id=authorId,
             title=title,
             content=content
         )
 
+        if status and status[0] == "404":
+            raise HTTPException(status_code=400, detail="Author does not exist")
         if status and status[0] == "400":
             raise HTTPException(status_code=400, detail="Bad Request")
         
@@ -222,11 +397,24 @@ async def put_post(
         logger.log(status="e", message=f"Error creating post: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
     
+@app.post("/api/posts:batch")
+async def batch_posts(request: Request, posts: List[PostCreate]):
+    _check_batch(posts)
+
+    try:
+        results = await mariamanager.create_posts([post.model_dump() for post in posts])
+        return ORJSONResponse([results, 200])
+    except Exception as e:
+        logger.log(status="e", message=f"Error creating posts batch: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @app.delete("/api/posts/{id}")
 async def delete_post(request: Request, id: str) -> Tuple[str, int]:
     try:
-        status = mariamanager.delete_post(id)
+        status = await mariamanager.delete_post(id)
         
+        if status and status[0] == "404":
+            raise HTTPException(status_code=404, detail="Post not found")
         if status and status[0] == "400":
             raise HTTPException(status_code=400, detail="Bad Request")
             
@@ -246,23 +434,14 @@ async def patch_post(
     ):
 
     try:
-        post_info = mariamanager.get_post(id)
-        if not post_info or post_info[0] == "404":
-            raise HTTPException(status_code=404, detail="Post not found")
-
-        current_info = post_info[0]
-        
-        if title is not None:
-            current_info["title"] = title
-        if content is not None:
-            current_info["content"] = content
-
-        update_status = mariamanager.update_post(
+        update_status = await mariamanager.update_post(
             id=id,
-            title=current_info["title"],
-            content=current_info["content"]
+            title=title,
+            content=content
         )
 
+        if update_status and update_status[0] == "404":
+            raise HTTPException(status_code=404, detail="Post not found")
         if update_status and update_status[0] == "400":
             raise HTTPException(status_code=400, detail="Bad Request")
 
@@ -274,82 +453,159 @@ async def patch_post(
         logger.log(status="e", message=f"Error updating post {id}: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readyz():
+    if not app.state.ready:
+        return ORJSONResponse({"status": "warming up"}, status_code=503)
+    return {"status": "ready"}
+
+def _compile_templates() -> int:
+    # loading a template compiles it and writes it to the bytecode cache
+    names = templates.env.list_templates()
+    for name in names:
+        templates.env.get_template(name)
+    return len(names)
+
+async def _warm_up() -> None:
+    settings = conf["fastapi"]["warm_up"]
+
+    while True:
+        started = perf_counter()
+
+        try:
+            await mariamanager.warm_up(
+                connections=settings["connections"],
+                cache_rows=settings["cache_rows"]
+            )
+            compiled = await mariamanager.run(_compile_templates)
+
+            posts, _ = await blog.list_posts()
+            await mariamanager.run(lambda: [post_cards(post) for post in posts])
+
+            app.state.ready = True
+            logger.log(
+                status="l",
+                message=f"Warm-up finished in {perf_counter() - started:.3f}s: {compiled} templates, {len(posts)} post cards"
+            )
+            return
+        except Exception as e:
+            logger.log(status="e", message=f"Warm-up failed, retrying in {settings['retry_interval']}s: {e}")
+            await async_sleep(settings["retry_interval"])
+
 # api
 
+async def _cached_page(request: Request, key, render) -> Response:
+    # the token is taken before the data is read, so a page rendered from rows
+    # that were changed meanwhile is not stored; with key None nothing is cached
+    page = page_cache.get(key) if key is not None else None
+
+    if page is None:
+        token = page_cache.token()
+
+        try:
+            with track_replica_reads() as reads:
+                response = await render()
+        except ReadFailed as e:
+            # not cached, the next request reads again
+            logger.log(status="e", message=f"Error rendering {request.url.path}: {e}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+        # only found pages and real "not found" answers are kept,
+        # and not ones read from a replica right after this worker changed the table
+        if key is None or response.status_code not in (200, 404) or not mariamanager.connection.cacheable(reads):
+            return response
+
+        page = page_cache.store(key, response, token)
+
+    return page.response(request)
+
 @app.get("/")
 async def index(request: Request):
-    return templates.TemplateResponse(
-        "index.html",
-        {
-            "request": request,
-            "message": "Hello, FastAPI!"
-        }
-    )
+    async def render():
+        return templates.TemplateResponse(
+            "index.html",
+            {
+                "request": request,
+                "message": "Hello, FastAPI!"
+            }
+        )
 
-@app.get("/users")
-def users(request: Request):
-    try:
-        all_users = requests.get("http://127.0.0.1:8000/api/users", timeout=5)
-    except TimeoutError:
-        return 404
+    return await _cached_page(request, ("index", None), render)
 
+@app.get("/users")
+async def users(request: Request, after: Optional[str] = None):
+    key = _parse_cursor(after)
+
+    async def render():
+        all_users, next_key = await blog.list_users(after=key)
+
+        return templates.TemplateResponse(
+            "users.html",{
+                "request": request,
+                "users": all_users,
+                "next_cursor": encode_cursor(*next_key) if next_key else None
+            }
+        )
 
-    return templates.TemplateResponse(
-        "users.html",{
-            "request": request,
-            "users": loads(all_users.text)[0]
-        }
-    )
+    # only the newest page is cached, it's the one invalidated when rows change
+    return await _cached_page(request, ("users", None) if key is None else None, render)
 
 @app.get("/users/{id}")
-def user(request: Request, id):
-    try:
-        this_user = requests.get(f"http://127.0.0.1:8000/api/users/{id}", timeout=5)
-    except TimeoutError:
-        return 404
-    
-    return templates.TemplateResponse(
-        "user.html",{
-            "request": request,
-            "user": loads(this_user.text)[0]
-        }
-    )
+async def user(request: Request, id: str):
+    async def render():
+        this_user = await blog.get_user(id)
+
+        return templates.TemplateResponse(
+            "user.html",{
+                "request": request,
+                "user": this_user
+            },
+            status_code=200 if this_user else 404
+        )
 
-@app.get("/posts")
-def posts(request: Request):
-    try:
-        all_posts = requests.get("http://127.0.0.1:8000/api/posts", timeout=5)
-    except TimeoutError:
-        return 404
+    # every spelling of the id shares one page, invalidated by the canonical id
+    key_id = canonical(id)
+    return await _cached_page(request, ("user", key_id) if key_id else None, render)
 
+@app.get("/posts")
+async def posts(request: Request, after: Optional[str] = None):
+    key = _parse_cursor(after)
+
+    async def render():
+        all_posts, next_key = await blog.list_posts(after=key)
+
+        return templates.TemplateResponse(
+            "posts.html",{
+                "request": request,
+                "posts": all_posts,
+                "next_cursor": encode_cursor(*next_key) if next_key else None
+            }
+        )
 
-    return templates.TemplateResponse(
-        "posts.html",{
-            "request": request,
-            "posts": loads(all_posts.text)
-        }
-    )
+    # only the newest page is cached, it's the one invalidated when rows change
+    return await _cached_page(request, ("posts", None) if key is None else None, render)
 
 @app.get("/posts/{id}")
-def post(request: Request, id):
-    try:
-        this_post = requests.get(f"http://127.0.0.1:8000/api/posts/{id}", timeout=5)
-    except TimeoutError:
-        return 404
-    
-    return templates.TemplateResponse(
-        "post.html",{
-            "request": request,
-            "post": loads(this_post.text)[0]
-        }
-    )
+async def post(request: Request, id: str):
+    async def render():
+        this_post = await blog.get_post(id)
+
+        return templates.TemplateResponse(
+            "post.html",{
+                "request": request,
+                "post": this_post
+            },
+            status_code=200 if this_post else 404
+        )
 
-@app.patch("/api/posts/{id}")
-async def patch_post(request: Request, id: str, title: str, content: str):
-    try:
-        status = mariamanager.update_post(id=id, title=title, content=content)
-        if status and status[0] == "400":
-            raise HTTPException(status_code=400, detail="Bad Request")
-        return "OK", 200
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+    # every spelling of the id shares one page, invalidated by the canonical id
+    key_id = canonical(id)
+    return await _cached_page(request, ("post", key_id) if key_id else None, render)
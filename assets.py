@@ -0,0 +1,213 @@
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from jinja2 import pass_context
+
+from pages import accepted_encodings
+
+from argparse import ArgumentParser
+from gzip import compress as gzip_compress
+from hashlib import sha256
+from json import load, dump
+from mimetypes import guess_type
+from os import makedirs, path, stat, stat_result, walk
+from re import compile as re_compile
+from shutil import rmtree
+from typing import Callable, Dict, Optional
+
+try:
+    from brotli import compress as brotli_compress
+except ImportError:
+    brotli_compress = None
+
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+
+# encodings in the order they are preferred, with the suffix of their files
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# files whose name doesn't change with their content, ex. dist/manifest.json, are revalidated
+REVALIDATE = "no-cache"
+
+# name.<hex digits of sha256>.ext written by build()
+HASHED_NAME = re_compile(r"\.[0-9a-f]{6,64}(\.[^.]+)?$")
+
+
+def build(
+        directory: str,
+        hash_length: int = 12
+    ) -> Dict[str, str]:
+    """
+    Copies every static file to directory/dist under a content-hashed name
+    (styles/global.css -> styles/global.3f2a1b4c9d0e.css) next to .gz and, if
+    brotli is installed, .br copies, and writes the name mapping to dist/manifest.json.
+    Compressed copies that aren't smaller than the file are skipped.
+
+    :param directory: static directory
+    :type directory: str
+
+    :param hash_length: number of hex digits of sha256 in names
+    :type hash_length: int
+
+    :returns: manifest {original path: hashed path}
+    :rtype: Dict[str, str]
+    """
+
+    dist = path.join(directory, DIST)
+    rmtree(dist, ignore_errors=True)
+
+    manifest = {}
+
+    for root, dirs, files in walk(directory):
+        if path.abspath(root) == path.abspath(directory):
+            dirs[:] = [name for name in dirs if name != DIST]
+
+        for name in sorted(files):
+            source = path.join(root, name)
+            relative = path.relpath(source, directory).replace(path.sep, "/")
+
+            with open(source, "rb") as file:
+                data = file.read()
+
+            stem, extension = path.splitext(relative)
+            hashed = f"{stem}.{sha256(data).hexdigest()[:hash_length]}{extension}"
+
+            target = path.join(dist, hashed)
+            makedirs(path.dirname(target), exist_ok=True)
+
+            with open(target, "wb") as file:
+                file.write(data)
+
+            variants = {".gz": gzip_compress(data, compresslevel=9, mtime=0)}
+            if brotli_compress is not None:
+                variants[".br"] = brotli_compress(data, quality=11)
+
+            for suffix, compressed in variants.items():
+                if len(compressed) < len(data):
+                    with open(target + suffix, "wb") as file:
+                        file.write(compressed)
+
+            manifest[relative] = hashed
+
+    with open(path.join(dist, MANIFEST), "w", encoding="utf-8") as file:
+        dump(manifest, file, indent=4, sort_keys=True)
+
+    return manifest
+
+
+def load_manifest(directory: str) -> Dict[str, str]:
+    """
+    Reads dist/manifest.json written by build()
+
+    :param directory: static directory
+    :type directory: str
+
+    :returns: manifest or an empty dictionary if assets weren't built
+    :rtype: Dict[str, str]
+    """
+
+    try:
+        with open(path.join(directory, DIST, MANIFEST), encoding="utf-8") as file:
+            return load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def static_url_for(manifest: Dict[str, str]) -> Callable:
+    """
+    url_for() for templates that points url_for('static', path=...) to the hashed copy of a file.
+    Files missing from the manifest keep their original URL. URLs are paths without the host,
+    so a rendered page doesn't depend on the Host header and can be cached once.
+
+    :param manifest: manifest from load_manifest()
+    :type manifest: Dict[str, str]
+
+    :returns: Jinja global
+    :rtype: Callable
+    """
+
+    @pass_context
+    def url_for(context, name: str, /, **path_params):
+        request = context["request"]
+
+        if name == "static" and path_params.get("path") in manifest:
+            path_params["path"] = f"{DIST}/{manifest[path_params['path']]}"
+
+        return request.scope.get("root_path", "") + request.app.url_path_for(name, **path_params)
+
+    return url_for
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+        StaticFiles that serves the hashed files from dist/ with an immutable
+        Cache-Control and picks their .br/.gz copy by Accept-Encoding. Files in
+        dist/ without a content hash in the name (manifest.json) are sent with
+        no-cache, other files are served as usual.
+    """
+
+    def file_response(
+            self,
+            full_path,
+            stat_result: stat_result,
+            scope,
+            status_code: int = 200
+        ) -> Response:
+
+        if f"{path.sep}{DIST}{path.sep}" not in str(full_path):
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding"))
+        media_type = guess_type(str(full_path))[0] or "text/plain"
+
+        response = None
+
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+
+            variant = self._variant(str(full_path) + suffix)
+            if variant is not None:
+                response = FileResponse(
+                    str(full_path) + suffix,
+                    status_code=status_code,
+                    stat_result=variant,
+                    media_type=media_type,
+                    headers={"Content-Encoding": encoding}
+                )
+                break
+
+        if response is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, media_type=media_type)
+
+        hashed = HASHED_NAME.search(path.basename(str(full_path))) is not None
+        response.headers["Cache-Control"] = IMMUTABLE if hashed else REVALIDATE
+        response.headers["Vary"] = "Accept-Encoding"
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    @staticmethod
+    def _variant(filepath: str) -> Optional[stat_result]:
+        try:
+            return stat(filepath)
+        except OSError:
+            return None
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Builds hashed and precompressed static files")
+    parser.add_argument("--conf", default="confs/conf.json", help="path to conf.json")
+    args = parser.parse_args()
+
+    conf = load(open(args.conf, encoding="utf-8"))
+    manifest = build(conf["fastapi"]["static"])
+
+    print(f"Built {len(manifest)} file(s) into {path.join(conf['fastapi']['static'], DIST)}")
+    if brotli_compress is None:
+        print("brotli is not installed, only .gz copies were written")
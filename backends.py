@@ -0,0 +1,243 @@
+import sqlite3
+
+from datetime import datetime
+from typing import Dict, Optional
+from uuid import UUID
+
+from ids import to_bytes
+
+
+sqlite3.register_adapter(UUID, lambda value: value.bytes)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATETIME", lambda value: datetime.fromisoformat(value.decode("utf-8")))
+
+
+class MariaBackend:
+    """
+        MariaDB server. The connector is imported on the first connection,
+        so installs that use another backend don't need it.
+
+        :param args: keyword arguments of mariadb.Connection
+        :type args: Dict
+    """
+
+    name = "mariadb"
+    # every DDL statement commits implicitly
+    transactional_ddl = False
+
+    def __init__(self, args: Dict) -> None:
+        self.args = args
+
+    def connect(self):
+        """
+        Opens a mariadb connection
+
+        :returns: connection
+        :rtype: mariadb.Connection
+        """
+
+        from mariadb import Connection
+        from mariadb.constants import CLIENT
+
+        # affected rows of an UPDATE are the matched ones, not only the changed ones
+        return Connection(client_flag=CLIENT.FOUND_ROWS, **self.args)
+
+    def retryable(self, e: Exception) -> bool:
+        """
+        Whether a transaction that failed with e can be replayed: lock wait timeout or deadlock
+        """
+
+        return getattr(e, "errno", None) in (1205, 1213)
+
+    def disconnected(self, e: Exception) -> bool:
+        """
+        Whether e means the server couldn't be reached: can't connect, server gone away or connection lost
+        """
+
+        return getattr(e, "errno", None) in (2002, 2003, 2006, 2013, 2055)
+
+
+class SQLiteConnection:
+    """
+        sqlite3 connection with the part of the mariadb.Connection interface db.py uses
+    """
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+        self.auto_reconnect = True
+        self._autocommit = True
+
+    @property
+    def autocommit(self) -> bool:
+        return self._autocommit
+
+    @autocommit.setter
+    def autocommit(self, value: bool) -> None:
+        # with isolation_level set sqlite3 opens a transaction before the first write;
+        # IMMEDIATE takes the write lock right away, waiting up to the busy timeout
+        self._autocommit = value
+        self.conn.isolation_level = None if value else "IMMEDIATE"
+
+    def cursor(self, buffered: bool = True) -> "SQLiteCursor":
+        return SQLiteCursor(self.conn.cursor())
+
+    def ping(self) -> None:
+        self.conn.execute("SELECT 1;")
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def rollback(self) -> None:
+        self.conn.rollback()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class SQLiteCursor:
+    """
+        sqlite3 cursor with the part of the mariadb.Cursor interface db.py uses.
+        Rows are read lazily, so it behaves like an unbuffered cursor too.
+    """
+
+    def __init__(self, cursor: sqlite3.Cursor) -> None:
+        self.cursor = cursor
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    @property
+    def rowcount(self) -> int:
+        return self.cursor.rowcount
+
+    def execute(self, statement: str, data: tuple = ()) -> None:
+        self.cursor.execute(statement, data)
+
+    def executemany(self, statement: str, data) -> None:
+        self.cursor.executemany(statement, data)
+
+    def fetchall(self) -> list:
+        return self.cursor.fetchall()
+
+    def fetchmany(self, size: int) -> list:
+        return self.cursor.fetchmany(size)
+
+    def close(self) -> None:
+        self.cursor.close()
+
+
+class SQLiteBackend:
+    """
+        Embedded SQLite database in one file, for single node installs and tests.
+
+        Every pooled connection is opened in WAL mode, so readers don't block the
+        writer, with the given pragmas applied. SQLite's UPDATE row count is the
+        number of matched rows, the same as mariadb with FOUND_ROWS.
+
+        :param database: path of the database file
+        :type database: str
+
+        :param pragmas: PRAGMA name -> value applied to every connection
+        :type pragmas: Dict
+
+        :param shared_cache: open connections in shared-cache mode. SQLite discourages it with WAL,
+            because shared-cache tables are locked per table and waits for them ignore busy_timeout
+        :type shared_cache: bool
+
+        :param timeout: seconds to wait for a lock held by another connection
+        :type timeout: float
+    """
+
+    name = "sqlite"
+    # CREATE/DROP/ALTER roll back with the transaction they ran in
+    transactional_ddl = True
+
+    pragmas = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY",
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+    }
+
+    def __init__(
+            self,
+            database: str,
+            pragmas: Optional[Dict] = None,
+            shared_cache: bool = False,
+            timeout: float = 5.0
+        ) -> None:
+
+        self.database = database
+        self.pragmas = {**self.pragmas, **(pragmas or {})}
+        self.shared_cache = shared_cache
+        self.timeout = timeout
+
+    def connect(self) -> SQLiteConnection:
+        """
+        Opens a connection and applies the pragmas
+
+        :returns: connection
+        :rtype: SQLiteConnection
+        """
+
+        conn = sqlite3.connect(
+            f"file:{self.database}?cache={'shared' if self.shared_cache else 'private'}",
+            uri=True,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES
+        )
+
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value};")
+
+        # used by the migration that converts text ids to 16 bytes
+        conn.create_function("uuid_to_bin", 1, to_bytes, deterministic=True)
+
+        return SQLiteConnection(conn)
+
+    def retryable(self, e: Exception) -> bool:
+        """
+        Whether a transaction that failed with e can be replayed: the database or a table was locked
+        """
+
+        return isinstance(e, sqlite3.OperationalError) and "locked" in str(e)
+
+    def disconnected(self, e: Exception) -> bool:
+        """
+        An embedded database can't be disconnected
+        """
+
+        return False
+
+
+def make_backend(
+        name: str,
+        args: Dict,
+        sqlite: Optional[Dict] = None
+    ):
+    """
+    Backend by its name in conf.json
+
+    :param name: "mariadb" or "sqlite"
+    :type name: str
+
+    :param args: mariadb connection arguments
+    :type args: Dict
+
+    :param sqlite: SQLiteBackend arguments
+    :type sqlite: Dict
+
+    :returns: backend
+    :rtype: MariaBackend | SQLiteBackend
+    """
+
+    if name == "mariadb":
+        return MariaBackend(args)
+    if name == "sqlite":
+        return SQLiteBackend(**(sqlite or {}))
+
+    raise ValueError(f"Unknown database backend {name}")
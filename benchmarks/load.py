@@ -0,0 +1,326 @@
+"""
+Load test of the running app: starts app.py with uvicorn against a seeded
+database, drives every scenario at each concurrency level for a fixed time
+and prints throughput and latency percentiles as JSON.
+
+    python benchmarks/load.py --concurrency 1 8 32 --duration 10 --output run.json
+    python benchmarks/load.py --output new.json --compare run.json
+
+By default the app runs on the sqlite backend in a temporary file, migrated
+with init.py and seeded with --users/--posts rows. With --conf the configured
+database is used as it is (run init.py and seed it first); only the
+scenarios' ids are read from it through the API.
+
+With --compare the run is checked against an earlier one and the exit code is 1
+if throughput dropped or p95 grew by more than --threshold in any scenario.
+"""
+
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from http.client import HTTPConnection
+from json import dump, dumps, load, loads
+from os import environ, path
+from random import Random
+from shutil import rmtree
+from subprocess import Popen, DEVNULL, check_call, check_output
+from tempfile import mkdtemp
+from threading import Thread
+from time import perf_counter, sleep
+from urllib.parse import quote
+from uuid import uuid4
+
+import platform
+import sqlite3
+import sys
+
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+
+
+# name -> function(rng, ids) returning (method, url)
+SCENARIOS = {
+    "GET /api/posts": lambda rng, ids: ("GET", "/api/posts?limit=100"),
+    "GET /api/posts/{id}": lambda rng, ids: ("GET", f"/api/posts/{rng.choice(ids['posts'])}"),
+    "PUT /api/posts": lambda rng, ids: ("PUT", f"/api/posts?authorId={rng.choice(ids['users'])}&title=bench&content={quote('Some content of a blog post. ' * 20)}"),
+    "GET /api/users": lambda rng, ids: ("GET", "/api/users?limit=100"),
+    "GET /api/users/{id}": lambda rng, ids: ("GET", f"/api/users/{rng.choice(ids['users'])}"),
+    "GET /posts": lambda rng, ids: ("GET", "/posts"),
+    "GET /posts/{id}": lambda rng, ids: ("GET", f"/posts/{rng.choice(ids['posts'])}"),
+}
+
+
+def seed_sqlite(conf: str, database: str, users: int, posts: int, seed: int) -> None:
+    check_call([sys.executable, "init.py"], cwd=ROOT, env=dict(environ, BLOG_CONF=conf), stdout=DEVNULL)
+
+    rng = Random(seed)
+    started = datetime(2025, 10, 1, 12, 0, 0)
+
+    conn = sqlite3.connect(database)
+
+    user_rows = [
+        (uuid4().bytes, f"user{i}@example.com", f"user{i}", "0" * 128, started + timedelta(seconds=i), started + timedelta(seconds=i))
+        for i in range(users)
+    ]
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?, ?, ?);", user_rows)
+
+    post_rows = (
+        (uuid4().bytes, rng.choice(user_rows)[0], f"Post number {i}", "Some content of a blog post. " * rng.randint(5, 60), started + timedelta(seconds=i), started + timedelta(seconds=i))
+        for i in range(posts)
+    )
+    conn.executemany("INSERT INTO posts VALUES (?, ?, ?, ?, ?, ?);", post_rows)
+
+    conn.commit()
+    conn.close()
+
+
+def make_conf(source: str, workdir: str, sqlite: bool) -> str:
+    conf = load(open(path.join(ROOT, source), encoding="utf-8"))
+
+    for name in ("app", "db", "init"):
+        conf["logger"][name] = path.join(workdir, f"{name}_log.txt")
+    conf["fastapi"]["bytecode_cache"] = path.join(workdir, "jinja")
+
+    if sqlite:
+        conf["db"]["backend"] = "sqlite"
+        conf["db"]["sqlite"]["database"] = path.join(workdir, "blog.sqlite")
+
+    target = path.join(workdir, "conf.json")
+    with open(target, "w", encoding="utf-8") as file:
+        dump(conf, file)
+
+    return target
+
+
+def start_server(conf: str, port: int) -> Popen:
+    server = Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT,
+        env=dict(environ, BLOG_CONF=conf),
+        stdout=DEVNULL
+    )
+
+    for _ in range(300):
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            # /readyz answers 503 until the app has warmed up
+            status, _ = request("127.0.0.1", port, "GET", "/readyz")
+            if status == 200:
+                return server
+        except OSError:
+            pass
+        sleep(0.1)
+
+    server.terminate()
+    raise RuntimeError("Server wasn't ready in 30 seconds")
+
+
+def request(host: str, port: int, method: str, url: str) -> tuple:
+    conn = HTTPConnection(host, port, timeout=30)
+    try:
+        conn.request(method, url)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def collect_ids(host: str, port: int, limit: int = 1000) -> dict:
+    ids = {}
+
+    for table in ("users", "posts"):
+        status, body = request(host, port, "GET", f"/api/{table}?limit={limit}")
+        rows = loads(body)
+        if table == "users":
+            rows = rows[0]
+        ids[table] = [row["id"] for row in rows]
+
+        if not ids[table]:
+            raise RuntimeError(f"There are no {table} to benchmark with")
+
+    return ids
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(q * (len(values) - 1))))
+    return values[index]
+
+
+def run_scenario(
+        host: str,
+        port: int,
+        scenario,
+        ids: dict,
+        concurrency: int,
+        duration: float,
+        seed: int
+    ) -> dict:
+
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    deadline = perf_counter() + duration
+
+    def worker(n: int):
+        rng = Random(seed + n)
+        conn = HTTPConnection(host, port, timeout=30)
+
+        while perf_counter() < deadline:
+            method, url = scenario(rng, ids)
+            started = perf_counter()
+
+            try:
+                conn.request(method, url, headers={"Accept-Encoding": "gzip"})
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    errors[n] += 1
+            except OSError:
+                errors[n] += 1
+                conn.close()
+                conn = HTTPConnection(host, port, timeout=30)
+                continue
+
+            latencies[n].append(perf_counter() - started)
+
+        conn.close()
+
+    started = perf_counter()
+    threads = [Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - started
+
+    values = sorted(value for worker_latencies in latencies for value in worker_latencies)
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(values),
+        "errors": sum(errors),
+        "throughput": round(len(values) / elapsed, 2),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round((values[-1] if values else 0.0) * 1000, 3),
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """
+    Scenarios where throughput dropped or p95 grew by more than threshold
+    """
+
+    before = {(result["endpoint"], result["concurrency"]): result for result in baseline["results"]}
+    regressions = []
+
+    for result in current["results"]:
+        old = before.get((result["endpoint"], result["concurrency"]))
+        if old is None or not old["throughput"] or not old["p95_ms"]:
+            continue
+
+        throughput = result["throughput"] / old["throughput"] - 1
+        p95 = result["p95_ms"] / old["p95_ms"] - 1
+
+        if throughput < -threshold or p95 > threshold:
+            regressions.append({
+                "endpoint": result["endpoint"],
+                "concurrency": result["concurrency"],
+                "throughput_change": round(throughput, 4),
+                "p95_change": round(p95, 4),
+            })
+
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def main() -> int:
+    parser = ArgumentParser(description="Load test of the blog endpoints")
+    parser.add_argument("--conf", default=None, help="use this conf.json and its database instead of a seeded sqlite one")
+    parser.add_argument("--users", type=int, default=1000, help="users seeded into the sqlite database")
+    parser.add_argument("--posts", type=int, default=20000, help="posts seeded into the sqlite database")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario and concurrency level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of unmeasured load before every scenario")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="write results here instead of stdout")
+    parser.add_argument("--compare", default=None, help="results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative change for --compare")
+    parser.add_argument("--keep", action="store_true", help="keep the working directory with the database and logs")
+    args = parser.parse_args()
+
+    sqlite = args.conf is None
+    workdir = mkdtemp(prefix="blog-bench-")
+
+    conf = make_conf(args.conf or "confs/conf.json", workdir, sqlite)
+
+    if sqlite:
+        seed_sqlite(conf, path.join(workdir, "blog.sqlite"), args.users, args.posts, args.seed)
+
+    host = "127.0.0.1"
+    server = start_server(conf, args.port)
+
+    try:
+        ids = collect_ids(host, args.port)
+        results = []
+
+        for name in args.scenarios:
+            for concurrency in args.concurrency:
+                if args.warmup > 0:
+                    run_scenario(host, args.port, SCENARIOS[name], ids, concurrency, args.warmup, args.seed)
+
+                result = run_scenario(host, args.port, SCENARIOS[name], ids, concurrency, args.duration, args.seed)
+                results.append({"endpoint": name, **result})
+
+                print(f"{name:<24} c={concurrency:<4} {result['throughput']:>10} req/s  p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms", file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait()
+
+        if args.keep:
+            print(f"Working directory: {workdir}", file=sys.stderr)
+        else:
+            rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "database": "sqlite" if sqlite else args.conf,
+            "users": args.users if sqlite else None,
+            "posts": args.posts if sqlite else None,
+            "duration": args.duration,
+        },
+        "results": results,
+    }
+
+    exit_code = 0
+
+    if args.compare:
+        regressions = compare(load(open(args.compare, encoding="utf-8")), report, args.threshold)
+        report["regressions"] = regressions
+        exit_code = 1 if regressions else 0
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            dump(report, file, indent=4)
+    else:
+        print(dumps(report, indent=4))
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
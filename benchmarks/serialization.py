@@ -0,0 +1,71 @@
+"""
+Compares serialization of a /api/posts payload through FastAPI's default path
+(jsonable_encoder + JSONResponse) and through ORJSONResponse.
+
+    python benchmarks/serialization.py --posts 10000 --rounds 20
+"""
+
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from json import dumps
+from time import perf_counter
+from uuid import uuid4
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+
+def make_posts(count: int) -> list:
+    author = str(uuid4())
+    started = datetime(2025, 10, 1, 12, 0, 0)
+
+    return [
+        {
+            "id": str(uuid4()),
+            "authorId": author,
+            "title": f"Post number {i}",
+            "content": "Some content of a blog post. " * 20,
+            "createdAt": started + timedelta(seconds=i),
+            "updatedAt": started + timedelta(seconds=i),
+        }
+        for i in range(count)
+    ]
+
+
+def measure(render, payload, rounds: int) -> dict:
+    size = len(render(payload))
+    started = perf_counter()
+
+    for _ in range(rounds):
+        render(payload)
+
+    elapsed = (perf_counter() - started) / rounds
+
+    return {
+        "seconds_per_payload": round(elapsed, 6),
+        "payloads_per_second": round(1 / elapsed, 2),
+        "mb_per_second": round(size / elapsed / 1e6, 2),
+        "bytes": size,
+    }
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    posts = make_posts(args.posts)
+
+    results = {
+        "posts": args.posts,
+        "default": measure(lambda payload: JSONResponse(jsonable_encoder(payload)).body, posts, args.rounds),
+        "orjson": measure(lambda payload: ORJSONResponse(payload).body, posts, args.rounds),
+    }
+    results["speedup"] = round(results["default"]["seconds_per_payload"] / results["orjson"]["seconds_per_payload"], 2)
+
+    print(dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Any, Dict, Hashable, Optional
+
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+        Thread-safe in-process cache with LRU eviction and per-entry TTL.
+
+        Misses can be cached too (negative caching) with their own, usually shorter, TTL.
+        Loaders take a token() before reading from the database and pass it to set();
+        if anything was invalidated in between the value is not stored, so a slow
+        read can't put data back that a concurrent write has just replaced.
+
+        :param maxsize: maximum number of entries
+        :type maxsize: int
+
+        :param ttl: seconds a value lives in the cache
+        :type ttl: float
+
+        :param negative_ttl: seconds a cached miss lives in the cache
+        :type negative_ttl: float
+    """
+
+    def __init__(
+            self,
+            maxsize: int = 1024,
+            ttl: float = 60.0,
+            negative_ttl: float = 5.0
+        ) -> None:
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._epoch = 0
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "negative_hits": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    def get(
+            self,
+            key: Hashable
+        ) -> Any:
+        """
+        Looks a key up
+
+        :param key: cache key
+        :type key: Hashable
+
+        :returns: cached value or MISSING
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self._stats["misses"] += 1
+                return MISSING
+
+            value, expires, negative = entry
+
+            if expires < monotonic():
+                del self._entries[key]
+                self._stats["misses"] += 1
+                return MISSING
+
+            self._entries.move_to_end(key)
+            self._stats["negative_hits" if negative else "hits"] += 1
+
+            return value
+
+    def token(self) -> int:
+        """
+        Token to pass to set() after loading a value
+
+        :returns: current invalidation epoch
+        :rtype: int
+        """
+
+        return self._epoch
+
+    def set(
+            self,
+            key: Hashable,
+            value: Any,
+            token: Optional[int] = None,
+            negative: bool = False
+        ) -> bool:
+        """
+        Stores a value
+
+        :param key: cache key
+        :type key: Hashable
+
+        :param value: value to store
+        :type value: Any
+
+        :param token: token got before the value was loaded
+        :type token: int
+
+        :param negative: the value represents a miss, use negative_ttl
+        :type negative: bool
+
+        :returns: whether the value was stored
+        :rtype: bool
+        """
+
+        ttl = self.negative_ttl if negative else self.ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return False
+
+        with self._lock:
+            if token is not None and token != self._epoch:
+                return False
+
+            self._entries[key] = (value, monotonic() + ttl, negative)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+        return True
+
+    def invalidate(
+            self,
+            *keys: Hashable
+        ) -> None:
+        """
+        Drops keys from the cache
+
+        :param keys: keys to drop
+        :type keys: Hashable
+        """
+
+        with self._lock:
+            self._epoch += 1
+
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self._stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        """
+        Drops everything
+        """
+
+        with self._lock:
+            self._epoch += 1
+            self._stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """
+        Cache statistics
+
+        :returns: dictionary with counters and current size
+        :rtype: Dict
+        """
+
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                **self._stats
+            }
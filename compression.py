@@ -0,0 +1,190 @@
+from zlib import compressobj, Z_SYNC_FLUSH, MAX_WBITS
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from pages import accepted_encodings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COMPRESSIBLE = ("text/", "application/json", "application/x-ndjson", "application/javascript", "application/xml", "image/svg+xml")
+
+
+class _Gzip:
+    def __init__(self, level: int) -> None:
+        # wbits 16 + MAX_WBITS writes the gzip header and trailer
+        self.compressor = compressobj(level, wbits=16 + MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush(Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, level: int) -> None:
+        self.compressor = brotli.Compressor(quality=level)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self.compressor.process(data) + self.compressor.finish()
+
+
+class _Zstd:
+    def __init__(self, level: int) -> None:
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+        ASGI middleware that compresses responses with br, zstd or gzip, whichever
+        the client accepts first in that order and is installed (gzip always is).
+
+        A response sent in one body message is compressed only if it's at least
+        minimum_size bytes. Streaming responses are compressed chunk by chunk and
+        every chunk is flushed, so NDJSON rows reach the client as they are sent.
+        Responses that already have a Content-Encoding (precompressed static files,
+        cached pages) and non-text content types are passed through. A strong ETag
+        becomes weak, because the compressed body is a different representation.
+
+        :param app: wrapped ASGI app
+        :param minimum_size: smallest body in bytes that is compressed
+        :type minimum_size: int
+
+        :param gzip_level: gzip level, 1-9
+        :type gzip_level: int
+
+        :param brotli_quality: brotli quality, 0-11
+        :type brotli_quality: int
+
+        :param zstd_level: zstd level, 1-22
+        :type zstd_level: int
+    """
+
+    def __init__(
+            self,
+            app,
+            minimum_size: int = 1024,
+            gzip_level: int = 6,
+            brotli_quality: int = 4,
+            zstd_level: int = 3
+        ) -> None:
+
+        self.app = app
+        self.minimum_size = minimum_size
+
+        self.encoders: Dict[str, tuple] = {}
+        if brotli is not None:
+            self.encoders["br"] = (_Brotli, brotli_quality)
+        if zstandard is not None:
+            self.encoders["zstd"] = (_Zstd, zstd_level)
+        self.encoders["gzip"] = (_Gzip, gzip_level)
+
+    def _choose(self, scope) -> Optional[str]:
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding"))
+
+        for encoding in self.encoders:
+            if encoding in accepted:
+                return encoding
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self._choose(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        encoder = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, encoder, passthrough
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+
+                if (
+                    "content-encoding" in headers
+                    or message["status"] in (204, 304)
+                    or not content_type.startswith(COMPRESSIBLE)
+                ):
+                    passthrough = True
+                    await send(message)
+                    return
+
+                # wait for the first body message to know the size
+                start = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                factory, level = self.encoders[encoding]
+                encoder = factory(level)
+
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = encoder.finish(body)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                await send(start)
+
+            if more_body:
+                data = encoder.chunk(body)
+                if data:
+                    await send({"type": "http.response.body", "body": data, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": encoder.finish(body)})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,139 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import blake2b
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """
+    Strong ETag from the parts that identify a version of a resource, ex. ("post", id, updatedAt)
+
+    :returns: quoted etag
+    :rtype: str
+    """
+
+    raw = "|".join(str(part) for part in parts).encode("utf-8")
+    return '"' + blake2b(raw, digest_size=16).hexdigest() + '"'
+
+
+def body_etag(body: bytes) -> str:
+    """
+    Strong ETag of a response body
+
+    :param body: rendered body
+    :type body: bytes
+
+    :returns: quoted etag
+    :rtype: str
+    """
+
+    return '"' + blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def http_date(value: datetime) -> str:
+    """
+    Formats a datetime for Last-Modified. Naive datetimes from the database are local time,
+    the app writes them with datetime.now().
+
+    :param value: datetime to format
+    :type value: datetime
+
+    :returns: IMF-fixdate
+    :rtype: str
+    """
+
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def validators(
+        etag: str,
+        last_modified: Optional[datetime] = None
+    ) -> Dict[str, str]:
+    """
+    ETag and Last-Modified headers
+
+    :param etag: quoted etag
+    :type etag: str
+
+    :param last_modified: time of the last change
+    :type last_modified: datetime
+
+    :returns: headers
+    :rtype: Dict[str, str]
+    """
+
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def is_conditional(request: Request) -> bool:
+    """
+    Whether the request has If-None-Match or If-Modified-Since
+    """
+
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def not_modified(
+        request: Request,
+        etag: str,
+        last_modified: Optional[datetime] = None
+    ) -> bool:
+    """
+    Evaluates If-None-Match and, if it's absent, If-Modified-Since (RFC 9110 13.2.2)
+
+    :param request: incoming request
+    :type request: Request
+
+    :param etag: current etag of the resource
+    :type etag: str
+
+    :param last_modified: time of the last change
+    :type last_modified: datetime
+
+    :returns: True if the client's copy is still fresh
+    :rtype: bool
+    """
+
+    if_none_match = request.headers.get("if-none-match")
+
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return etag in tags or f"W/{etag}" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+
+    if if_modified_since is not None and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+
+        # astimezone() reads a naive datetime as local time
+        return last_modified.astimezone(timezone.utc).replace(microsecond=0) <= since
+
+    return False
+
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    """
+    Empty 304 response carrying the validators
+
+    :param headers: headers made by validators()
+    :type headers: Dict[str, str]
+
+    :returns: response
+    :rtype: Response
+    """
+
+    return Response(status_code=304, headers=headers)
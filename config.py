@@ -0,0 +1,80 @@
+from copy import deepcopy
+from functools import lru_cache
+from json import load
+from os import environ, getpid, path
+from typing import Dict
+
+
+@lru_cache(maxsize=None)
+def load_json(filepath: str) -> Dict:
+    """
+    Reads a json file once, later calls get the same object
+
+    :param filepath: path to the file
+    :type filepath: str
+
+    :returns: parsed file
+    :rtype: Dict
+    """
+
+    with open(filepath, encoding="utf-8") as file:
+        return load(file)
+
+
+def _per_process_log(filepath: str) -> str:
+    # logs/app_log.txt -> logs/app_log.12345.txt
+    root, ext = path.splitext(filepath)
+    return f"{root}.{getpid()}{ext}"
+
+
+@lru_cache(maxsize=None)
+def get_conf() -> Dict:
+    """
+    conf.json, or the file in the BLOG_CONF environment variable.
+    Read on the first call and shared by app.py, db.py and init.py.
+
+    serve.py starts every worker with these environment variables:
+        BLOG_POOL_SIZE, BLOG_POOL_OVERFLOW, BLOG_EXECUTOR_WORKERS -- this process' share of db.pool and db.executor
+        BLOG_LOG_PER_PROCESS=1 -- log files get the pid before the extension
+        BLOG_CACHE_TTL -- upper bound of db.cache and fastapi.page_cache lifetimes, caches of one worker
+            aren't invalidated by writes that went to another one
+
+    :returns: configuration
+    :rtype: Dict
+    """
+
+    conf = deepcopy(load_json(environ.get("BLOG_CONF", "confs/conf.json")))
+
+    for variable, section, key in (
+            ("BLOG_POOL_SIZE", "pool", "size"),
+            ("BLOG_POOL_OVERFLOW", "pool", "overflow"),
+            ("BLOG_EXECUTOR_WORKERS", "executor", "workers")
+        ):
+        if variable in environ:
+            conf["db"][section][key] = int(environ[variable])
+
+    if "BLOG_CACHE_TTL" in environ:
+        ttl = int(environ["BLOG_CACHE_TTL"])
+        for cache, key in (
+                (conf["db"]["cache"], "ttl"),
+                (conf["db"]["cache"], "negative_ttl"),
+                (conf["fastapi"]["page_cache"], "ttl")
+            ):
+            cache[key] = min(cache[key], ttl)
+
+    if environ.get("BLOG_LOG_PER_PROCESS") == "1":
+        for name in ("app", "db", "init"):
+            conf["logger"][name] = _per_process_log(conf["logger"][name])
+
+    return conf
+
+
+def get_queries() -> Dict:
+    """
+    sql.json from the db.queries path of the configuration
+
+    :returns: query name -> sql
+    :rtype: Dict
+    """
+
+    return load_json(get_conf()["db"]["queries"])
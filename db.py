@@ -1,22 +1,471 @@
-from mariadb import Connection, Cursor
-
 from uuid import UUID
-from typing import Dict, List
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from collections import deque
+from contextlib import contextmanager
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor
+from asyncio import get_running_loop, wrap_future
+from functools import partial
+from threading import Condition
+from time import monotonic, perf_counter, sleep
 
 from datetime import datetime
 from sys import exit
-from json import load
 from uuid import uuid4
 from hashlib import sha512
 
-from models import InvalidMariaArguments, User, Post
+from models import InvalidMariaArguments, PoolTimeout, User, Post
+from cache import LRUCache, MISSING
+from metrics import registry
+from backends import make_backend
+from replicas import ReplicaSet, read_from_primary, replica_reads, track_replica_reads
+from config import get_conf, get_queries
+from ids import uuid7, to_bytes, from_bytes, decode_row, canonical
+from rows import column_names, to_records, compact as compact_rows
 
 from logger import Logger
 
-confs = load(open("confs/conf.json", encoding="utf-8"))
-queries = load(open(confs["db"]["queries"], encoding="utf-8"))
+confs = get_conf()
+queries = get_queries()
+
+db_logger = Logger(confs["logger"]["db"], **confs["logger"]["settings"])
+
+query_names = {query: name for name, query in queries.items()}
+
+query_seconds = registry.histogram(
+    "blog_db_query_seconds",
+    "Time spent executing and fetching a query, by sql.json key",
+    ("query",)
+)
+query_errors = registry.counter(
+    "blog_db_query_errors_total",
+    "Queries that raised an exception, by sql.json key",
+    ("query",)
+)
+
+
+class _PooledConnection:
+    """
+        Bookkeeping wrapper around a pooled connection
+    """
+
+    __slots__ = ("conn", "created", "last_used")
+
+    def __init__(self, conn) -> None:
+        self.conn = conn
+        self.created = monotonic()
+        self.last_used = self.created
+
+
+class ConnectionPool:
+    """
+        Bounded pool of database connections.
+
+        Keeps up to ``size`` connections open between queries and allows up to
+        ``overflow`` extra ones under load. Overflow connections are closed once
+        nobody is waiting for them.
+
+        :param connect: factory that opens a new connection
+        :type connect: Callable
+
+        :param size: number of connections kept open between queries
+        :type size: int
+
+        :param overflow: number of extra connections allowed when the pool is exhausted
+        :type overflow: int
+
+        :param timeout: seconds to wait for a free connection before giving up
+        :type timeout: float
+
+        :param idle_timeout: seconds after which an idle connection is closed instead of reused
+        :type idle_timeout: float
+
+        :param max_lifetime: seconds after which a connection is replaced
+        :type max_lifetime: float
+
+        :param ping_after: idle seconds after which a connection is pinged before reuse
+        :type ping_after: float
+    """
+
+    def __init__(
+            self,
+            connect: Callable,
+            size: int = 5,
+            overflow: int = 10,
+            timeout: float = 5.0,
+            idle_timeout: float = 300.0,
+            max_lifetime: float = 3600.0,
+            ping_after: float = 30.0
+        ) -> None:
+
+        self.connect = connect
+        self.size = size
+        self.overflow = overflow
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+
+        self._idle = deque()
+        self._cond = Condition()
+        self._open = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        self._stats = {
+            "checkouts": 0,
+            "created": 0,
+            "closed": 0,
+            "timeouts": 0,
+            "health_failures": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def _close(self, entry: _PooledConnection) -> None:
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, entry: _PooledConnection, now: float) -> bool:
+        if now - entry.created > self.max_lifetime:
+            return False
+        
+        if now - entry.last_used > self.idle_timeout:
+            return False
+
+        if now - entry.last_used > self.ping_after:
+            try:
+                entry.conn.ping()
+            except Exception:
+                with self._cond:
+                    self._stats["health_failures"] += 1
+                return False
+
+        return True
+
+    def acquire(self) -> _PooledConnection:
+        """
+        Checks a connection out of the pool, opening a new one if needed
+
+        :returns: pooled connection
+        :rtype: _PooledConnection
+        """
+
+        started = monotonic()
+        deadline = started + self.timeout
+
+        while True:
+            with self._cond:
+                while True:
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+
+                    if self._open < self.size + self.overflow:
+                        self._open += 1
+                        entry = None
+                        break
+
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(f"No free connection after {self.timeout} seconds")
+
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+
+                self._in_use += 1
+                self._stats["checkouts"] += 1
+                self._stats["wait_seconds"] += monotonic() - started
+
+            if entry is not None:
+                if self._healthy(entry, monotonic()):
+                    return entry
+
+                self._close(entry)
+                with self._cond:
+                    self._stats["closed"] += 1
+
+            try:
+                entry = _PooledConnection(self.connect())
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+            with self._cond:
+                self._stats["created"] += 1
+
+            return entry
+
+    def release(
+            self,
+            entry: _PooledConnection,
+            broken: bool = False
+        ) -> None:
+        """
+        Returns a connection to the pool
+
+        :param entry: connection got from acquire
+        :type entry: _PooledConnection
+
+        :param broken: close the connection instead of reusing it
+        :type broken: bool
+        """
+
+        entry.last_used = monotonic()
+
+        with self._cond:
+            self._in_use -= 1
+
+            keep = (
+                not broken
+                and (self._open <= self.size or self._waiting > 0)
+                and entry.last_used - entry.created <= self.max_lifetime
+            )
+
+            if keep:
+                self._idle.append(entry)
+            else:
+                self._open -= 1
+                self._stats["closed"] += 1
+
+            self._cond.notify()
+
+        if not keep:
+            self._close(entry)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks a connection out and always returns it
+
+        :returns: raw connection
+        """
+
+        entry = self.acquire()
+        broken = False
+
+        try:
+            yield entry.conn
+        except Exception:
+            try:
+                entry.conn.ping()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self.release(entry, broken=broken)
+
+    def prefill(
+            self,
+            count: Optional[int] = None
+        ) -> None:
+        """
+        Opens connections ahead of time
+
+        :param count: number of connections to open, defaults to the pool size
+        :type count: int
+        """
+
+        entries = []
+        try:
+            for _ in range(min(count or self.size, self.size)):
+                entries.append(self.acquire())
+        finally:
+            for entry in entries:
+                self.release(entry)
+
+    def close(self) -> None:
+        """
+        Closes every idle connection
+        """
+
+        with self._cond:
+            entries = list(self._idle)
+            self._idle.clear()
+            self._open -= len(entries)
+            self._stats["closed"] += len(entries)
+
+        for entry in entries:
+            self._close(entry)
+
+    def stats(self) -> Dict:
+        """
+        Pool usage statistics
+
+        :returns: dictionary with counters and current usage
+        :rtype: Dict
+        """
+
+        with self._cond:
+            return {
+                "size": self.size,
+                "overflow": self.overflow,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                **self._stats
+            }
+
+
+class Transaction:
+    """
+        Unit of work got from MariaConnection.transaction().
+
+        Statements are only queued while the with block runs. When it ends
+        without an exception they are executed in order on one pooled connection
+        and committed once; if the block raises nothing is executed. A deadlock
+        or lock wait timeout rolls back and replays the whole batch. Rows returned
+        by a statement (ex. DELETE ... RETURNING) are kept in results.
+
+        :param mariamanager: connection whose pool is used
+        :type mariamanager: MariaConnection
+
+        :param retries: how many times the batch is replayed after a deadlock
+        :type retries: int
+
+        :param backoff: seconds to wait before the first replay, doubled every time
+        :type backoff: float
+    """
+
+    def __init__(
+            self,
+            mariamanager: "MariaConnection",
+            retries: int = 3,
+            backoff: float = 0.05
+        ) -> None:
+
+        self.mariamanager = mariamanager
+        self.retries = retries
+        self.backoff = backoff
+
+        self.statements = []
+        self.rowcounts = []
+        self.results = []
+
+    def execute(
+            self,
+            query: str,
+            data: tuple = ()
+        ) -> int:
+        """
+        Queues one statement
+
+        :param query: sql query
+        :type query: str
+
+        :param data: data that you need to insert into query
+        :type data: tuple
+
+        :returns: index of the statement in rowcounts
+        :rtype: int
+        """
+
+        self.statements.append((False, query, data))
+        return len(self.statements) - 1
+
+    def executemany(
+            self,
+            query: str,
+            data: List[tuple]
+        ) -> int:
+        """
+        Queues one statement for many rows
+
+        :param query: sql query
+        :type query: str
+
+        :param data: rows to insert into query
+        :type data: List[tuple]
+
+        :returns: index of the statement in rowcounts
+        :rtype: int
+        """
 
-db_logger = Logger(confs["logger"]["db"])
+        self.statements.append((True, query, data))
+        return len(self.statements) - 1
+
+    def _run(self, mariaconn) -> Tuple[List[int], List[Optional[list]]]:
+        rowcounts = []
+        results = []
+        cursor = mariaconn.cursor()
+
+        try:
+            for many, query, data in self.statements:
+                name = query_names.get(query, "other")
+                started = perf_counter()
+
+                try:
+                    if many:
+                        cursor.executemany(query, data)
+                    else:
+                        cursor.execute(query, data)
+                except Exception:
+                    query_errors.inc(name)
+                    raise
+                finally:
+                    query_seconds.observe(perf_counter() - started, name)
+
+                # rows are fetched before rowcount, sqlite counts them while they are read
+                results.append([decode_row(row) for row in cursor.fetchall()] if cursor.description else None)
+                rowcounts.append(cursor.rowcount)
+
+            mariaconn.commit()
+        finally:
+            cursor.close()
+
+        return rowcounts, results
+
+    def commit(self) -> None:
+        """
+        Executes the queued statements and commits them
+        """
+
+        if not self.statements:
+            return
+
+        attempt = 0
+
+        while True:
+            with self.mariamanager.pool.connection() as mariaconn:
+                mariaconn.autocommit = False
+
+                try:
+                    self.rowcounts, self.results = self._run(mariaconn)
+                    return
+                except Exception as e:
+                    mariaconn.rollback()
+
+                    if not self.mariamanager.backend.retryable(e) or attempt >= self.retries:
+                        db_logger.log(
+                            status="e",
+                            message=f"Transaction failed! Full exception {e}"
+                        )
+                        raise
+
+                    db_logger.log(
+                        status="l",
+                        message=f"Transaction hit a deadlock, retrying. Full exception {e}"
+                    )
+                finally:
+                    mariaconn.autocommit = True
+
+            sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+    def __enter__(self) -> "Transaction":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
 
 
 class MariaConnection:
@@ -37,6 +486,33 @@ class MariaConnection:
 
         :param database: name of a database that contains tables
         :type database: str
+
+        :param pool: connection pool settings, see ConnectionPool
+        :type pool: Dict
+
+        :param cache: settings of the get_user/get_post caches, see LRUCache
+        :type cache: Dict
+
+        :param transaction: {"retries", "backoff"} used when a transaction hits a deadlock
+        :type transaction: Dict
+
+        :param backend: "mariadb" or "sqlite", with "sqlite" the connection arguments above are not used
+        :type backend: str
+
+        :param sqlite: settings of the sqlite backend, see SQLiteBackend
+        :type sqlite: Dict
+
+        :param uuid_version: 4 for random ids or 7 for time-ordered ones. Ids are stored as BINARY(16)
+            and converted to and from canonical strings here, so callers only see strings.
+        :type uuid_version: int
+
+        :param replicas: connection arguments of mariadb read replicas, every one gets a pool like the primary.
+            Read-only queries go to them round-robin, writes and transactions to the primary.
+        :type replicas: List[Dict]
+
+        :param replication: {"eject_seconds", "sticky_seconds"}: how long a failed replica gets no reads
+            and how long a table is read from the primary after this process changed it
+        :type replication: Dict
     """
 
     def __init__(
@@ -45,7 +521,15 @@ class MariaConnection:
             port: int,
             user: str,
             password: str,
-            database: str
+            database: str,
+            pool: Optional[Dict] = None,
+            cache: Optional[Dict] = None,
+            transaction: Optional[Dict] = None,
+            backend: str = "mariadb",
+            sqlite: Optional[Dict] = None,
+            uuid_version: int = 4,
+            replicas: Optional[List[Dict]] = None,
+            replication: Optional[Dict] = None
         ) -> None:
 
         if type(port) != int:
@@ -62,72 +546,212 @@ class MariaConnection:
             "database": database
         }
 
-        try:
-            db_logger.log(
-                status="l", 
-                message="Testing mariadb connection"
-            )
-            
-            self.mariaconn = Connection(**self.args)
+        self.backend = make_backend(backend, self.args, sqlite)
+        self.new_id = uuid7 if uuid_version == 7 else uuid4
 
-            db_logger.log(
-                status="l", 
-                message="Connection is successful"
-            )
+        self.pool = ConnectionPool(
+            connect=self._open_session,
+            **(pool or {})
+        )
 
-        except Exception as e:
+        self.user_cache = LRUCache(**(cache or {}))
+        self.post_cache = LRUCache(**(cache or {}))
+
+        self.tx_retries = (transaction or {}).get("retries", 3)
+        self.tx_backoff = (transaction or {}).get("backoff", 0.05)
+
+        self._listeners: List[Callable[[str, Tuple[str, ...]], None]] = []
+
+        replication = replication or {}
+        replicas = replicas or []
+
+        if replicas and backend != "mariadb":
             db_logger.log(
-                status="f",
-                message=f"Connection failed! Full error {e}"
+                status="e",
+                message=f"Read replicas are not supported by the {backend} backend, they are not used"
             )
+            replicas = []
 
-            raise InvalidMariaArguments("Maria arguments are incorrect!")
-        
-        self.mariaconn.close()
+        self.replicas = ReplicaSet(
+            pools=[
+                ConnectionPool(
+                    connect=partial(self._open_session, make_backend("mariadb", replica)),
+                    **(pool or {})
+                )
+                for replica in replicas
+            ],
+            names=[f"{replica['host']}:{replica['port']}" for replica in replicas],
+            eject_seconds=replication.get("eject_seconds", 30.0)
+        )
 
-    def _open_session(
-            self
+        # table -> monotonic() until which its rows read from a replica aren't cached, see cacheable()
+        self.sticky_seconds = replication.get("sticky_seconds", 5.0)
+        self._written: Dict[str, float] = {}
+
+    def warm_up(
+            self,
+            connections: Optional[int] = None,
+            cache_rows: int = 0
         ) -> None:
         """
-        Opens new mariadb session
+        Opens pooled connections and loads the newest rows into the get_user/get_post caches,
+        so the first requests don't pay for it. Nothing is opened before this or the first query.
 
-        :returns: none
-        :rtype: None
+        :param connections: number of connections to open, defaults to the pool size
+        :type connections: int
+
+        :param cache_rows: number of the newest users and posts put into the caches
+        :type cache_rows: int
         """
 
+        db_logger.log(
+            status="l",
+            message=f"Warming up {self.backend.name} connections"
+        )
+
+        self.pool.prefill(connections)
+
+        for index, replica in enumerate(self.replicas.pools):
+            try:
+                replica.prefill(connections)
+            except Exception as e:
+                db_logger.log(
+                    status="e",
+                    message=f"Replica {self.replicas.names[index]} is unavailable. Full exception: {e}"
+                )
+                self.replicas.eject(index)
+
+        for table, cache in (("users", self.user_cache), ("posts", self.post_cache)):
+            if cache_rows > 0:
+                token = cache.token()
+                rows, _ = self._page(table=table, limit=cache_rows, newest=True)
+                if rows == ["400"]:
+                    raise RuntimeError(f"Couldn't read {table} while warming up")
+
+                for row in rows:
+                    cache.set(row.id, (row,), token=token)
+
+        db_logger.log(
+            status="l",
+            message="Warm-up finished"
+        )
+
+    def _open_session(
+            self,
+            backend=None
+        ):
+        """
+        Opens new database session, used by the pool to create connections
+
+        :param backend: backend to connect to, the primary by default
+        :type backend: MariaBackend | SQLiteBackend
+
+        :returns: new connection of the backend
+        """
+
+        backend = backend or self.backend
+
         try:
             db_logger.log(
                 status="l",
-                message="Creating new mariadb session"
+                message=f"Creating new {backend.name} session"
             )
             
-            self.mariaconn = Connection(**self.args)
-            self.mariaconn.autocommit = True
-            self.mariaconn.auto_reconnect = True
-
-            self.cursor = Cursor(self.mariaconn)
+            mariaconn = backend.connect()
+            mariaconn.autocommit = True
+            mariaconn.auto_reconnect = True
 
             db_logger.log(
                 status="l",
-                message="Mariadb session created successfully"
+                message=f"{backend.name} session created successfully"
             )
 
+            return mariaconn
+
         except Exception as e:
             db_logger.log(
                 status="f",
-                message=f"Something went wrong with mariadb. Probably it's a problem with it's args. Full exception {e}"
+                message=f"Something went wrong with {backend.name}. Probably it's a problem with it's args. Full exception {e}"
             )
 
             raise InvalidMariaArguments("Maria arguments are incorrect!")
 
+    def pool_stats(self) -> Dict:
+        """
+        Connection pool statistics
+
+        :returns: dictionary with pool counters
+        :rtype: Dict
+        """
+
+        return self.pool.stats()
+
+    def replica_stats(self) -> Dict:
+        """
+        Statistics of the read replicas
+
+        :returns: {replica name: counters}
+        :rtype: Dict
+        """
+
+        return self.replicas.stats()
+
+    def cache_stats(self) -> Dict:
+        """
+        Statistics of the get_user/get_post caches
+
+        :returns: dictionary with users and posts cache counters
+        :rtype: Dict
+        """
+
+        return {
+            "users": self.user_cache.stats(),
+            "posts": self.post_cache.stats()
+        }
     
+    def on_change(
+            self,
+            listener: Callable[[str, Tuple[str, ...]], None]
+        ) -> None:
+        """
+        Registers a callable that is called as listener(table, ids) after rows
+        of "users" or "posts" are created, updated or deleted through this connection
+
+        :param listener: callable
+        :type listener: Callable
+        """
+
+        self._listeners.append(listener)
+
+    def _changed(
+            self,
+            table: str,
+            *ids
+        ) -> None:
+        ids = tuple(str(id) for id in ids)
+
+        # caches of this process were just invalidated, don't refill them from a replica that lags behind
+        self._written[table] = monotonic() + self.sticky_seconds
+
+        for listener in self._listeners:
+            try:
+                listener(table, ids)
+            except Exception as e:
+                db_logger.log(
+                    status="e",
+                    message=f"Change listener failed! Full exception: {e}"
+                )
+
     def _execute(
             self,
             query: str,
-            data: tuple
+            data: tuple,
+            name: Optional[str] = None,
+            mapper: Optional[Callable] = None,
+            read_table: Optional[str] = None
         ) -> tuple:
         """
-        Executes any query.
+        Executes any query on a pooled connection.
 
         :param query: sql query
         :type query: str
@@ -135,44 +759,261 @@ class MariaConnection:
         :param data: data that you need to insert into query
         :type data: tuple
 
+        :param name: name of the query in metrics, looked up in sql.json by default
+        :type name: str
+
+        :param mapper: function(columns, rows) applied to the fetched rows, e.g. rows.to_records
+        :type mapper: Callable
+
+        :param read_table: table a read-only query reads, it may run on a replica then
+        :type read_table: str
+
         :returns: empty tuple of fetched tuple
         :rtype: tuple
         """
-        self._open_session()
 
-        try:
-            db_logger.log(
-                status="l", 
-                message="Executing query"
-            )
+        name = name or query_names.get(query, "other")
+
+        replica = self._choose_replica(read_table)
+        if replica is not None:
+            try:
+                result = self._query(self.replicas.pools[replica], query, data, name, mapper, on_replica=True)
+            except Exception as e:
+                self._replica_failed(replica, e)
+            else:
+                reads = replica_reads.get()
+                if reads is not None:
+                    reads.add(read_table)
+                return result
+
+        return self._query(self.pool, query, data, name, mapper)
+
+    def _choose_replica(
+            self,
+            table: Optional[str]
+        ) -> Optional[int]:
+        """
+        Replica for a read-only query on table. The primary is used if the request
+        has to read its own writes.
+
+        :param table: table the query reads, None for queries that must run on the primary
+        :type table: str
+
+        :returns: index of the replica or None for the primary
+        :rtype: Optional[int]
+        """
+
+        if table is None or not len(self.replicas) or read_from_primary.get():
+            return None
+
+        return self.replicas.choose()
+
+    def cacheable(
+            self,
+            reads: Iterable[str]
+        ) -> bool:
+        """
+        Whether data read inside track_replica_reads() may be cached. It may not if it came
+        from a replica while this process changed the same table within sticky_seconds:
+        the caches were just invalidated and the replica may not have the change yet.
+
+        :param reads: tables read from a replica, see replicas.track_replica_reads
+        :type reads: Iterable[str]
+
+        :returns: True if the data can be cached
+        :rtype: bool
+        """
+
+        now = monotonic()
+        return not any(self._written.get(table, 0.0) > now for table in reads)
+
+    def _replica_failed(
+            self,
+            index: int,
+            e: Exception
+        ) -> None:
+        """
+        Ejects a replica that couldn't be reached, the query is then run on the primary
+        """
+
+        db_logger.log(
+            status="e",
+            message=f"Query failed on replica {self.replicas.names[index]}, reading from the primary. Full exception: {e}"
+        )
+
+        if isinstance(e, (InvalidMariaArguments, PoolTimeout)) or self.backend.disconnected(e):
+            self.replicas.eject(index)
+
+    def _query(
+            self,
+            pool: "ConnectionPool",
+            query: str,
+            data: tuple,
+            name: str,
+            mapper: Optional[Callable] = None,
+            on_replica: bool = False
+        ) -> tuple:
+        """
+        Executes a query on a connection of pool, see _execute
+
+        :param on_replica: raise errors instead of returning ["400"], so the query can be repeated on the primary
+        :type on_replica: bool
+        """
+
+        with pool.connection() as mariaconn:
+            cursor = mariaconn.cursor()
+            started = perf_counter()
+
+            try:
+                db_logger.log(
+                    status="d", 
+                    message="Executing query"
+                )
+                
+                cursor.execute(
+                    statement=query,
+                    data=data
+                )
+
+                db_logger.log(
+                    status="d",
+                    message="Query executed successfully"
+                )
+            except Exception as e:
+                db_logger.log(
+                    status="e",
+                    message=f"An exception was raised while executing the query. Full exception: {e}"
+                )
+
+                cursor.close()
+                query_errors.inc(name)
+                if on_replica:
+                    raise
+                return ["400"]
             
-            self.cursor.execute(
-                statement=query,
-                data=data
-            )
+            try:
+                if cursor.description is None:
+                    return []
 
-            db_logger.log(
-                status="l",
-                message="Query executed successfully"
-            )
-        except Exception as e:
-            db_logger.log(
-                status="e",
-                message=f"An exception was raised while executing the query. Full exception: {e}"
-            )
+                rows = [decode_row(row) for row in cursor.fetchall()]
+                if mapper is None:
+                    return rows
 
-            return ["400"]
-        
-        try:
-            info = self.cursor.fetchall()
-        except:
-            return []
+                return mapper(column_names(cursor.description), rows)
+            finally:
+                cursor.close()
+                query_seconds.observe(perf_counter() - started, name)
 
-        if info:
-            return info
-        else:
-            self.mariaconn.close()
-            return []
+    def _execute_write(
+            self,
+            query: str,
+            data: tuple,
+            name: Optional[str] = None
+        ) -> int:
+        """
+        Executes INSERT/UPDATE/DELETE on a pooled connection.
+        Connections are opened with FOUND_ROWS, so UPDATE reports matched rows even if nothing changed.
+
+        :param query: sql query
+        :type query: str
+
+        :param data: data that you need to insert into query
+        :type data: tuple
+
+        :param name: name of the query in metrics, looked up in sql.json by default
+        :type name: str
+
+        :returns: number of affected rows
+        :rtype: int
+        """
+
+        name = name or query_names.get(query, "other")
+
+        with self.pool.connection() as mariaconn:
+            cursor = mariaconn.cursor()
+            started = perf_counter()
+
+            try:
+                cursor.execute(
+                    statement=query,
+                    data=data
+                )
+
+                return cursor.rowcount
+            except Exception as e:
+                db_logger.log(
+                    status="e",
+                    message=f"An exception was raised while executing the query. Full exception: {e}"
+                )
+
+                query_errors.inc(name)
+                raise
+            finally:
+                cursor.close()
+                query_seconds.observe(perf_counter() - started, name)
+
+    def transaction(
+            self,
+            retries: Optional[int] = None
+        ) -> "Transaction":
+        """
+        Unit of work. Statements added inside the with block run on one pooled
+        connection and are committed once when the block ends.
+
+            with mariamanager.transaction() as tx:
+                tx.execute(queries["delete_user"], (to_bytes(id),))
+                tx.execute(queries["delete_all_user_posts"], (to_bytes(id),))
+            tx.rowcounts[0]
+
+        :param retries: how many times the batch is replayed after a deadlock
+        :type retries: int
+
+        :returns: transaction to use as a context manager
+        :rtype: Transaction
+        """
+
+        return Transaction(
+            mariamanager=self,
+            retries=self.tx_retries if retries is None else retries,
+            backoff=self.tx_backoff
+        )
+
+    def _select_in(
+            self,
+            name: str,
+            values: list,
+            chunk_size: int = 1000
+        ) -> list:
+        """
+        Runs a sql.json query with "{ids}" IN lists for any number of values.
+        Every "{ids}" gets the same values.
+
+        :param name: key of the query in sql.json
+        :type name: str
+
+        :param values: values of the IN list
+        :type values: list
+
+        :param chunk_size: maximum values per query
+        :type chunk_size: int
+
+        :returns: all fetched rows
+        :rtype: list
+        """
+
+        rows = []
+
+        for i in range(0, len(values), chunk_size):
+            chunk = values[i:i + chunk_size]
+            query = queries[name].format(ids=", ".join("?" * len(chunk)))
+
+            data = self._execute(query=query, data=tuple(chunk) * queries[name].count("{ids}"), name=name)
+            if data and data[0] == "400":
+                raise RuntimeError(f"{name} failed")
+
+            rows.extend(data)
+
+        return rows
 
 
    
@@ -191,7 +1032,9 @@ class MariaConnection:
 
             data = self._execute(
                 query=queries["get_users"],
-                data=[]
+                data=[],
+                mapper=to_records,
+                read_table="users"
             )
 
             if (len(data) > 0 and data[0] != "400") or (len(data) == 0):
@@ -205,18 +1048,7 @@ class MariaConnection:
                     message="Something went wrong! Read logs higher"
                 )
 
-            outlist = []
-            for user in data:
-                outlist.append({
-                    "id": user[0],
-                    "email": user[1],
-                    "login": user[2],
-                    "password": user[3],
-                    "createdAt": user[4],
-                    "updatedAt": user[5]
-                })
-
-            return outlist    
+            return data
         except Exception as e:
             db_logger.log(
                 status="e",
@@ -224,6 +1056,198 @@ class MariaConnection:
             )
             return ["404"]
     
+    def _page(
+            self,
+            table: str,
+            limit: int,
+            after: Optional[Tuple[datetime, str]] = None,
+            compact: bool = False,
+            newest: bool = False
+        ) -> Tuple[list, Optional[Tuple[datetime, str]]]:
+        """
+        Runs a keyset page query ordered by (createdAt, id)
+
+        :param table: "users" or "posts"
+        :type table: str
+
+        :param limit: page size
+        :type limit: int
+
+        :param after: (createdAt, id) of the last row of the previous page
+        :type after: Tuple[datetime, str]
+
+        :param compact: return {"columns": [...], "rows": [...]} with the fetched tuples instead of records
+        :type compact: bool
+
+        :param newest: newest rows first, after is then the oldest row of the previous page
+        :type newest: bool
+
+        :returns: rows of the page and the keyset to continue after, None on the last page
+        :rtype: Tuple[list, Optional[Tuple[datetime, str]]]
+        """
+
+        name = f"get_{table}_newest" if newest else f"get_{table}_page"
+
+        if after is None:
+            query, data = queries[name], (limit + 1,)
+        else:
+            created_at, id = after
+            query, data = queries[f"{name}_after"], (created_at, created_at, to_bytes(id), limit + 1)
+
+        # one extra row tells that there is a next page
+        result = self._execute(
+            query=query,
+            data=data,
+            mapper=lambda columns, rows: (columns, rows),
+            read_table=table
+        )
+
+        if result and result[0] == "400":
+            return ["400"], None
+        if not result:
+            return [], None
+
+        columns, rows = result
+        next_key = None
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_key = (rows[-1][columns.index("createdAt")], rows[-1][columns.index("id")])
+
+        if compact:
+            return compact_rows(columns, rows), next_key
+
+        return to_records(columns, rows), next_key
+
+    def get_users_page(
+            self,
+            limit: int,
+            after: Optional[Tuple[datetime, str]] = None,
+            compact: bool = False,
+            newest: bool = False
+        ) -> Tuple[list, Optional[Tuple[datetime, str]]]:
+        """
+        Gets one page of users ordered by creation time
+
+        :param limit: page size
+        :type limit: int
+
+        :param after: (createdAt, id) of the last user of the previous page
+        :type after: Tuple[datetime, str]
+
+        :param compact: return {"columns": [...], "rows": [...]} instead of records
+        :type compact: bool
+
+        :param newest: newest users first
+        :type newest: bool
+
+        :returns: users of the page and the keyset to continue after, None on the last page
+        :rtype: Tuple[list, Optional[Tuple[datetime, str]]]
+        """
+
+        db_logger.log(
+            status="l",
+            message="Getting page of users"
+        )
+
+        return self._page(
+            table="users",
+            limit=limit,
+            after=after,
+            compact=compact,
+            newest=newest
+        )
+
+    def _stream(
+            self,
+            query: str,
+            data: tuple = (),
+            chunk_size: int = 500,
+            read_table: Optional[str] = None
+        ) -> Iterator[list]:
+        """
+        Streams query results with an unbuffered cursor, so rows are read from
+        the server as they are consumed instead of being fetched all at once.
+
+        The connection stays checked out until the generator is exhausted or closed.
+
+        :param query: sql query
+        :type query: str
+
+        :param data: data that you need to insert into query
+        :type data: tuple
+
+        :param chunk_size: number of rows fetched per chunk
+        :type chunk_size: int
+
+        :param read_table: table the query reads, it may run on a replica then
+        :type read_table: str
+
+        :returns: iterator over chunks of records
+        :rtype: Iterator[list]
+        """
+
+        pool = self.pool
+        entry = None
+
+        replica = self._choose_replica(read_table)
+        if replica is not None:
+            try:
+                pool = self.replicas.pools[replica]
+                entry = pool.acquire()
+            except Exception as e:
+                self._replica_failed(replica, e)
+                pool = self.pool
+
+        if entry is None:
+            entry = pool.acquire()
+
+        cursor = None
+        finished = False
+
+        try:
+            cursor = entry.conn.cursor(buffered=False)
+            cursor.execute(query, data)
+            columns = column_names(cursor.description)
+
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield to_records(columns, [decode_row(row) for row in rows])
+
+            finished = True
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    finished = False
+
+            # an unbuffered result that wasn't read to the end leaves the connection unusable
+            pool.release(entry, broken=not finished)
+
+    def stream_users(
+            self,
+            chunk_size: int = 500
+        ) -> Iterator[List[Dict]]:
+        """
+        Streams all users ordered by creation time
+
+        :param chunk_size: number of users per chunk
+        :type chunk_size: int
+
+        :returns: iterator over chunks of user records
+        :rtype: Iterator[list]
+        """
+
+        db_logger.log(
+            status="l",
+            message="Streaming all users"
+        )
+
+        yield from self._stream(queries["stream_users"], chunk_size=chunk_size, read_table="users")
+
     def create_user(
             self,
             email: str,
@@ -255,21 +1279,20 @@ class MariaConnection:
             if check:
                 return 0
 
-            self.password_unhashed = password_unhashed
-            self.password_hashed = sha512()
+            password_hashed = sha512()
 
-            self.password_hashed.update(
-                self.password_unhashed.encode(
+            password_hashed.update(
+                password_unhashed.encode(
                     encoding="utf-8"
                 )
             )
 
 
-            self.new_user = User(
-                id=uuid4(), 
+            new_user = User(
+                id=self.new_id(), 
                 email=email, 
                 login=login, 
-                password=self.password_hashed.hexdigest(),
+                password=password_hashed.hexdigest(),
                 createdAt=datetime.now(),
                 updatedAt=datetime.now()
             )
@@ -279,40 +1302,184 @@ class MariaConnection:
                 message="Creating new user"
             )
 
-            status = self._execute(
-                query=queries["create_user"],
-                data=(
-                    self.new_user.id,
-                    self.new_user.email,
-                    self.new_user.login,
-                    self.new_user.password,
-                    self.new_user.createdAt,
-                    self.new_user.updatedAt,
-                )
-            )
+            status = self._execute(
+                query=queries["create_user"],
+                data=(
+                    new_user.id.bytes,
+                    new_user.email,
+                    new_user.login,
+                    new_user.password,
+                    new_user.createdAt,
+                    new_user.updatedAt,
+                )
+            )
+
+            if (len(status) > 0 and status[0] != "400") or (len(status) == 0):
+                db_logger.log(
+                    status="l",
+                    message="User created successfully"
+                )
+
+                self._changed("users", new_user.id)
+
+                return ["200"]
+            else:
+                db_logger.log(
+                    status="l",
+                    message="Something went wrong! Read logs higher"
+                )
+                return ["400"]
+        except Exception as e:
+            db_logger.log(
+                status="e",
+                message=f"Something went wrong! Full exception: {e}"
+            )
+            
+            return ["400"]
+
+    def create_users(
+            self,
+            users: List[Dict]
+        ) -> List[Dict]:
+        """
+        Creates many users at once: existing emails/logins are found with one
+        set-based query and the new users are inserted in one transaction.
+
+        :param users: list of {"email", "login", "password"}
+        :type users: List[Dict]
+
+        :returns: one {"index", "status", "id"/"detail"} result per user, in the same order
+        :rtype: List[Dict]
+        """
+
+        db_logger.log(
+            status="l",
+            message=f"Creating {len(users)} users"
+        )
+
+        results = [None] * len(users)
+
+        try:
+            taken = set()
+            for email, login in self._select_in("check_users_batch", list({user["email"] for user in users} | {user["login"] for user in users})):
+                taken.add(("email", email))
+                taken.add(("login", login))
+        except Exception as e:
+            db_logger.log(
+                status="e",
+                message=f"Checking users failed! Full exception: {e}"
+            )
+            return [{"index": i, "status": 500, "detail": "Internal server error"} for i in range(len(users))]
+
+        now = datetime.now()
+        rows = []
+        indexes = []
+
+        for i, user in enumerate(users):
+            if ("email", user["email"]) in taken or ("login", user["login"]) in taken:
+                results[i] = {"index": i, "status": 400, "detail": "Email or login already exists"}
+                continue
+
+            taken.add(("email", user["email"]))
+            taken.add(("login", user["login"]))
+
+            id = self.new_id()
+            rows.append((id.bytes, user["email"], user["login"], sha512(user["password"].encode("utf-8")).hexdigest(), now, now))
+            indexes.append(i)
+            results[i] = {"index": i, "status": 201, "id": str(id)}
+
+        if rows:
+            try:
+                with self.transaction() as tx:
+                    tx.executemany(queries["create_user"], rows)
+
+                self._changed("users", *(from_bytes(row[0]) for row in rows))
+            except Exception as e:
+                db_logger.log(
+                    status="e",
+                    message=f"Creating users failed! Full exception: {e}"
+                )
+                for i in indexes:
+                    results[i] = {"index": i, "status": 400, "detail": "Bad Request"}
+
+        return results
+    
+    
+    def _version(
+            self,
+            cache: LRUCache,
+            name: str,
+            id: str
+        ) -> Optional[datetime]:
+        """
+        updatedAt of one row for conditional requests. Comes from the cache when the row is there,
+        otherwise from a query that reads only the primary key index and updatedAt, never content.
+
+        :param cache: user_cache or post_cache
+        :type cache: LRUCache
+
+        :param name: name of the version query
+        :type name: str
+
+        :param id: row id
+        :type id: str
+
+        :returns: updatedAt or None if the row doesn't exist
+        :rtype: Optional[datetime]
+        """
+
+        id = canonical(id)
+        if id is None:
+            return None
+
+        cached = cache.get(id)
+        if cached is not MISSING:
+            return cached[0]["updatedAt"] if cached is not None else None
+
+        data = self._execute(
+            query=queries[name],
+            data=(to_bytes(id),),
+            name=name,
+            read_table="users" if cache is self.user_cache else "posts"
+        )
+
+        if not data or data[0] == "400":
+            return None
+
+        return data[0][0]
+
+    def get_user_version(
+            self,
+            id: str
+        ) -> Optional[datetime]:
+        """
+        Gets user's updatedAt without fetching the user
+
+        :param id: user's id
+        :type id: str
+
+        :returns: updatedAt or None if there is no such user
+        :rtype: Optional[datetime]
+        """
+
+        return self._version(self.user_cache, "get_user_version", id)
+
+    def get_post_version(
+            self,
+            id: str
+        ) -> Optional[datetime]:
+        """
+        Gets post's updatedAt without fetching its content
+
+        :param id: post id
+        :type id: str
 
-            if (len(status) > 0 and status[0] != "400") or (len(status) == 0):
-                db_logger.log(
-                    status="l",
-                    message="User created successfully"
-                )
+        :returns: updatedAt or None if there is no such post
+        :rtype: Optional[datetime]
+        """
+
+        return self._version(self.post_cache, "get_post_version", id)
 
-                return ["200"]
-            else:
-                db_logger.log(
-                    status="l",
-                    message="Something went wrong! Read logs higher"
-                )
-                return ["400"]
-        except Exception as e:
-            db_logger.log(
-                status="e",
-                message=f"Something went wrong! Full exception: {e}"
-            )
-            
-            return ["400"]
-    
-    
     def get_user(
             self,
             id: str = "",
@@ -323,21 +1490,34 @@ class MariaConnection:
         :param id: user's id
         :type id: str
         
-        :returns: list with all user's information
+        :returns: list with all user's information, ["404"] if there is no such user, ["400"] if the query failed
         :rtype: list
         """
 
+        id = canonical(id)
+        if id is None:
+            return ["404"]
+
         try:
 
+            cached = self.user_cache.get(id)
+            if cached is not MISSING:
+                return list(cached) if cached is not None else ["404"]
+
+            token = self.user_cache.token()
+
             db_logger.log(
                 status="l",
                 message="Getting user's info"
             )
 
-            data = self._execute(
-                query=queries["get_user"],
-                data=(id,)
-            )
+            with track_replica_reads() as reads:
+                data = self._execute(
+                    query=queries["get_user"],
+                    data=(to_bytes(id),),
+                    mapper=to_records,
+                    read_table="users"
+                )
 
             if (len(data) > 0 and data[0] != "400") or (len(data) == 0):
                 db_logger.log(
@@ -350,35 +1530,39 @@ class MariaConnection:
                     message="Something went wrong! Read logs higher"
                 )
 
-            outlist = []
-            for user in data:
-                outlist.append({
-                    "id": user[0],
-                    "email": user[1],
-                    "login": user[2],
-                    "password": user[3],
-                    "createdAt": user[4],
-                    "updatedAt": user[5]
-                })
-
-            if outlist == []:
+            if data and data[0] == "400":
+                return ["400"]
+
+            if not self.cacheable(reads):
+                return data if data else ["404"]
+
+            if data == []:
+                self.user_cache.set(id, None, token=token, negative=True)
                 return ["404"]
 
-            return outlist
+            # records are shared with the cache, callers must not modify them
+            self.user_cache.set(id, tuple(data), token=token)
+
+            return data
         
         except Exception as e:
-            return ["404"]
+            db_logger.log(
+                status="e",
+                message=f"User was not got correctly! Full exception: {e}"
+            )
+            return ["400"]
 
 
     def update_user(
             self,
             id: str,
-            login: str,
-            email: str,
-            password_unhashed: str,
+            login: Optional[str] = None,
+            email: Optional[str] = None,
+            password_unhashed: Optional[str] = None,
         ) -> List[str]:
         """
-        Equivalent to PUT method
+        Equivalent to PATCH method, fields that are None are kept.
+        Existence check and update are one statement.
 
         :param id: current id
         :type id: str
@@ -392,29 +1576,42 @@ class MariaConnection:
         :param password_unhashed: new password
         :type password_unhashed: str
 
-        :returns: none
-        :rtype: None
+        :returns: ["200"], ["404"] if there is no such user or ["400"]
+        :rtype: List[str]
         """
 
+        id = canonical(id)
+        if id is None:
+            return ["404"]
+
         try:
             db_logger.log(
                 status="l",
                 message="Updating user"
             )
 
-            status = self._execute(
+            password = None
+            if password_unhashed is not None:
+                password = sha512(str(password_unhashed).encode("utf-8")).hexdigest()
+
+            affected = self._execute_write(
                 query=queries["put_user"],
-                data=(email, login, sha512(str(password_unhashed).encode("utf-8")).hexdigest(), datetime.now(), id)
+                data=(email, login, password, datetime.now(), to_bytes(id))
             )
-            
-            try:
-                if status[0] == "400":
-                    return ["400"]
-            except:
-                db_logger.log(
-                    status="l",
-                    message="User was successfully updated"
-                )
+
+            self.user_cache.invalidate(id)
+
+            if affected == 0:
+                return ["404"]
+
+            self._changed("users", id)
+
+            db_logger.log(
+                status="l",
+                message="User was successfully updated"
+            )
+
+            return ["200"]
 
         except Exception as e:
             db_logger.log(
@@ -427,6 +1624,19 @@ class MariaConnection:
             self,
             id: str
         ) -> List[str]:
+        """
+        Deletes user and all of it's posts
+
+        :param id: user's id
+        :type id: str
+
+        :returns: ["200"], ["404"] if there is no such user or ["400"]
+        :rtype: List[str]
+        """
+
+        id = canonical(id)
+        if id is None:
+            return ["404"]
 
         try:
             db_logger.log(
@@ -434,24 +1644,30 @@ class MariaConnection:
                 message="Deleting user"
             )
 
-            status = self._execute(
-                query=queries["delete_user"],
-                data=(id,)
-            )
+            # the deleted ids come from the DELETE itself, a post added while it runs can't be missed
+            with self.transaction() as tx:
+                tx.execute(queries["delete_user"], (to_bytes(id),))
+                posts = tx.execute(queries["delete_all_user_posts"], (to_bytes(id),))
 
-            self.delete_posts(
-                authorId=id
+            post_ids = [row[0] for row in tx.results[posts]]
+
+            self.user_cache.invalidate(id)
+            self.post_cache.invalidate(*post_ids)
+
+            if post_ids:
+                self._changed("posts", *post_ids)
+
+            if tx.rowcounts[0] == 0:
+                return ["404"]
+
+            self._changed("users", id)
+
+            db_logger.log(
+                status="l",
+                message="User and it's posts was successfully deleted"
             )
 
-            try:
-                if status[0] == "400":
-                    return ["400"]
-                
-            except:
-                db_logger.log(
-                    status="l",
-                    message="User and it's posts was successfully deleted"
-                )
+            return ["200"]
         
         except Exception as e:
             db_logger.log(
@@ -474,8 +1690,10 @@ class MariaConnection:
 
         data = self._execute(
             query=queries["get_posts"],
-            data=[]
-       )
+            data=[],
+            mapper=to_records,
+            read_table="posts"
+        )
 
         if (len(data) > 0 and data[0] != "400") or (len(data) == 0):
             db_logger.log(
@@ -488,18 +1706,67 @@ class MariaConnection:
                 message="Something went wrong! Read logs higher"
             )
 
-        outlist = []
-        for post in data:
-            outlist.append({
-                "id": post[0],
-                "authorId": post[1],
-                "title": post[2],
-                "content": post[3],
-                "createdAt": post[4],
-                "updatedAt": post[5]
-            })
+        return data
+
+    def get_posts_page(
+            self,
+            limit: int,
+            after: Optional[Tuple[datetime, str]] = None,
+            compact: bool = False,
+            newest: bool = False
+        ) -> Tuple[list, Optional[Tuple[datetime, str]]]:
+        """
+        Gets one page of posts ordered by creation time
+
+        :param limit: page size
+        :type limit: int
+
+        :param after: (createdAt, id) of the last post of the previous page
+        :type after: Tuple[datetime, str]
+
+        :param compact: return {"columns": [...], "rows": [...]} instead of records
+        :type compact: bool
+
+        :param newest: newest posts first
+        :type newest: bool
+
+        :returns: posts of the page and the keyset to continue after, None on the last page
+        :rtype: Tuple[list, Optional[Tuple[datetime, str]]]
+        """
+
+        db_logger.log(
+            status="l",
+            message="Getting page of posts"
+        )
+
+        return self._page(
+            table="posts",
+            limit=limit,
+            after=after,
+            compact=compact,
+            newest=newest
+        )
+
+    def stream_posts(
+            self,
+            chunk_size: int = 500
+        ) -> Iterator[List[Dict]]:
+        """
+        Streams all posts ordered by creation time
+
+        :param chunk_size: number of posts per chunk
+        :type chunk_size: int
+
+        :returns: iterator over chunks of post records
+        :rtype: Iterator[list]
+        """
+
+        db_logger.log(
+            status="l",
+            message="Streaming all posts"
+        )
 
-        return outlist
+        yield from self._stream(queries["stream_posts"], chunk_size=chunk_size, read_table="posts")
 
     def get_post(
             self,
@@ -511,21 +1778,34 @@ class MariaConnection:
         :param id: post id
         :type id: str
         
-        :returns: list with all information about post
+        :returns: list with all information about post, ["404"] if there is no such post, ["400"] if the query failed
         :rtype: list
         """
 
+        id = canonical(id)
+        if id is None:
+            return ["404"]
+
         try:
 
+            cached = self.post_cache.get(id)
+            if cached is not MISSING:
+                return list(cached) if cached is not None else ["404"]
+
+            token = self.post_cache.token()
+
             db_logger.log(
                 status="l",
                 message="Getting post info"
             )
 
-            data = self._execute(
-                query=queries["get_post"],
-                data=(id,)
-            )
+            with track_replica_reads() as reads:
+                data = self._execute(
+                    query=queries["get_post"],
+                    data=(to_bytes(id),),
+                    mapper=to_records,
+                    read_table="posts"
+                )
 
             if (len(data) > 0 and data[0] != "400") or (len(data) == 0):
                 db_logger.log(
@@ -538,24 +1818,27 @@ class MariaConnection:
                     message="Something went wrong! Read logs higher"
                 )
 
-            outlist = []
-            for user in data:
-                outlist.append({
-                    "id": user[0],
-                    "authorId": user[1],
-                    "title": user[2],
-                    "content": user[3],
-                    "createdAt": user[4],
-                    "updatedAt": user[5]
-                })
-
-            if outlist == []:
+            if data and data[0] == "400":
+                return ["400"]
+
+            if not self.cacheable(reads):
+                return data if data else ["404"]
+
+            if data == []:
+                self.post_cache.set(id, None, token=token, negative=True)
                 return ["404"]
 
-            return outlist
+            # records are shared with the cache, callers must not modify them
+            self.post_cache.set(id, tuple(data), token=token)
+
+            return data
         
         except Exception as e:
-            return ["404"]
+            db_logger.log(
+                status="e",
+                message=f"Post was not got correctly! Full exception: {e}"
+            )
+            return ["400"]
 
     def create_post(
             self,
@@ -564,7 +1847,7 @@ class MariaConnection:
             content: str,
         ) -> list:
         """
-        Creates a new post
+        Creates a new post. The author is checked by the same INSERT ... SELECT statement.
 
         :param authorId: author's id
         :type authorId: UUID
@@ -574,41 +1857,107 @@ class MariaConnection:
 
         :param content: post's content
         :type content: str
+
+        :returns: ["200"], ["404"] if the author doesn't exist or ["400"]
+        :rtype: list
         """
         try:
+            db_logger.log(
+                status="l",
+                message="Creating post"
+            )
+
+            now = datetime.now()
+            id = self.new_id()
+
+            affected = self._execute_write(
+                query=queries["create_post"],
+                data=(id.bytes, to_bytes(author_id), title, content, now, now, to_bytes(author_id))
+            )
 
-            if self.get_user(author_id) == []:
+            if affected == 0:
                 db_logger.log(
                     status="e",
                     message="User does not exits"
                 )
-                return 0
-        
+                return ["404"]
+
             db_logger.log(
                 status="l",
-                message="Creating post"
+                message="Post was successfully created"
             )
 
-            status = self._execute(
-                query=queries["create_post"],
-                data=(uuid4(), author_id, title, content, datetime.now(), datetime.now())
+            self._changed("posts", id)
+
+            return ["200"]
+
+        except:
+            return ["400"]
+
+    def create_posts(
+            self,
+            posts: List[Dict]
+        ) -> List[Dict]:
+        """
+        Creates many posts at once: authors are checked with one set-based query
+        and the posts are inserted in one transaction.
+
+        :param posts: list of {"authorId", "title", "content"}
+        :type posts: List[Dict]
+
+        :returns: one {"index", "status", "id"/"detail"} result per post, in the same order
+        :rtype: List[Dict]
+        """
+
+        db_logger.log(
+            status="l",
+            message=f"Creating {len(posts)} posts"
+        )
+
+        results = [None] * len(posts)
+
+        try:
+            # ids are compared in their canonical form, ex. upper case ids match too
+            author_ids = {post["authorId"]: to_bytes(post["authorId"]) for post in posts}
+            authors = {row[0] for row in self._select_in("check_authors_batch", list({value for value in author_ids.values() if value is not None}))}
+        except Exception as e:
+            db_logger.log(
+                status="e",
+                message=f"Checking authors failed! Full exception: {e}"
             )
+            return [{"index": i, "status": 500, "detail": "Internal server error"} for i in range(len(posts))]
+
+        now = datetime.now()
+        rows = []
+        indexes = []
+
+        for i, post in enumerate(posts):
+            author_id = author_ids[post["authorId"]]
+
+            if author_id is None or from_bytes(author_id) not in authors:
+                results[i] = {"index": i, "status": 400, "detail": "Author does not exist"}
+                continue
+
+            id = self.new_id()
+            rows.append((id.bytes, author_id, post["title"], post["content"], now, now))
+            indexes.append(i)
+            results[i] = {"index": i, "status": 201, "id": str(id)}
 
+        if rows:
             try:
-                if status[0] == "400":
-                    db_logger.log(
-                        status="d",
-                        message="400"
-                    )
-                    return ["400"]
-            except:
+                with self.transaction() as tx:
+                    tx.executemany(queries["create_posts_batch"], rows)
+
+                self._changed("posts", *(from_bytes(row[0]) for row in rows))
+            except Exception as e:
                 db_logger.log(
-                    status="l",
-                    message="Post was successfully created"
+                    status="e",
+                    message=f"Creating posts failed! Full exception: {e}"
                 )
+                for i in indexes:
+                    results[i] = {"index": i, "status": 400, "detail": "Bad Request"}
 
-        except:
-            return ["400"]
+        return results
 
     def delete_post(
             self,
@@ -619,30 +1968,43 @@ class MariaConnection:
 
         :param id: post's id
         :type id: UUID
+
+        :returns: ["200"], ["404"] if there is no such post or ["400"]
+        :rtype: List[str]
         """
+
+        id = canonical(id)
+        if id is None:
+            return ["404"]
+
         try:
             db_logger.log(
                 status="l",
                 message="Deleting post"
             )
 
-            status = self._execute(
+            affected = self._execute_write(
                 query=queries["delete_post"],
-                data=(id,)
+                data=(to_bytes(id),)
             )
 
-            try:
-                if status[0] == "400":
-                    return ["400"]
-                
-            except:
-                db_logger.log(
-                    status="l",
-                    message="Post was successfully deleted"
-                )
+            self.post_cache.invalidate(id)
+
+            if affected == 0:
+                return ["404"]
+
+            self._changed("posts", id)
+
+            db_logger.log(
+                status="l",
+                message="Post was successfully deleted"
+            )
+
+            return ["200"]
         except:
             return ["400"]
     
+
     def delete_posts(
             self,
             authorId: str
@@ -660,11 +2022,15 @@ class MariaConnection:
             message="Deleting author's posts"
         )
 
-        self._execute(
+        post_ids = self._execute(
             query=queries["delete_all_user_posts"],
-            data=(authorId,)
+            data=(to_bytes(authorId),)
         )
 
+        if post_ids and post_ids[0] != "400":
+            self.post_cache.invalidate(*(row[0] for row in post_ids))
+            self._changed("posts", *(row[0] for row in post_ids))
+
         db_logger.log(
             status="l",
             message="Post was successfully deleted"
@@ -673,11 +2039,12 @@ class MariaConnection:
     def update_post(
             self,
             id: str,
-            title: str,
-            content: str,
+            title: Optional[str] = None,
+            content: Optional[str] = None,
         ) -> List[str]:
         """
-        Equivalent to PUT method
+        Equivalent to PATCH method, fields that are None are kept.
+        Existence check and update are one statement.
 
         :param id: post id
         :type id: str
@@ -688,29 +2055,38 @@ class MariaConnection:
         :param content: new content
         :type content: str
 
-        :returns: dictionary with code
-        :rtype: Dict[str]
+        :returns: ["200"], ["404"] if there is no such post or ["400"]
+        :rtype: List[str]
         """
 
+        id = canonical(id)
+        if id is None:
+            return ["404"]
+
         try:
             db_logger.log(
                 status="l",
                 message="Updating post"
             )
 
-            status = self._execute(
+            affected = self._execute_write(
                 query=queries["update_post"],
-                data=(title, content, datetime.now(), id)
+                data=(title, content, datetime.now(), to_bytes(id))
+            )
+
+            self.post_cache.invalidate(id)
+
+            if affected == 0:
+                return ["404"]
+
+            self._changed("posts", id)
+
+            db_logger.log(
+                status="l",
+                message="Post was successfully updated"
             )
-            
-            try:
-                if status[0] == "400":
-                    return ["400"]
-            except:
-                db_logger.log(
-                    status="l",
-                    message="Post was successfully updated"
-                )
+
+            return ["200"]
 
         except Exception as e:
             db_logger.log(
@@ -718,4 +2094,104 @@ class MariaConnection:
                 message=f"Updating [post] failed! Full exception {e}"
             )
             return ["400"]
-        
+
+
+class AsyncMariaConnection:
+    """
+        Async facade over MariaConnection.
+
+        Every public method of the wrapped connection is available as a coroutine
+        that runs on a dedicated bounded thread pool, so a slow query only occupies
+        one worker thread instead of the event loop.
+
+        :param connection: synchronous connection that does the actual work
+        :type connection: MariaConnection
+
+        :param workers: number of threads, defaults to the pool size plus overflow
+        :type workers: int
+    """
+
+    def __init__(
+            self,
+            connection: MariaConnection,
+            workers: Optional[int] = None
+        ) -> None:
+
+        self.connection = connection
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or connection.pool.size + connection.pool.overflow,
+            thread_name_prefix="mariadb"
+        )
+
+    async def run(
+            self,
+            func: Callable,
+            *args,
+            **kwargs
+        ):
+        """
+        Runs any blocking callable on the executor
+
+        :param func: callable to run
+        :type func: Callable
+
+        :returns: whatever func returns
+        """
+
+        call = partial(copy_context().run, func, *args, **kwargs)
+        return await get_running_loop().run_in_executor(self.executor, call)
+
+    async def iterate(
+            self,
+            iterator: Iterator
+        ) -> AsyncIterator:
+        """
+        Consumes a blocking iterator (ex. stream_posts) on the executor
+
+        :param iterator: iterator to consume
+        :type iterator: Iterator
+
+        :returns: async iterator with the same items
+        :rtype: AsyncIterator
+        """
+
+        done = object()
+        fetch = None
+
+        try:
+            while True:
+                fetch = self.executor.submit(copy_context().run, next, iterator, done)
+                item = await wrap_future(fetch)
+                if item is done:
+                    break
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                if fetch is not None and not fetch.done():
+                    # cancelled mid-fetch: next() keeps running on its thread, the cursor is
+                    # closed by that thread once it returns instead of under it
+                    fetch.add_done_callback(lambda _: close())
+                else:
+                    await self.run(close)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.connection, name)
+
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        async def method(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        method.__name__ = name
+        method.__doc__ = attr.__doc__
+
+        return method
+
+    def shutdown(self) -> None:
+        """
+        Waits for running queries and stops the executor
+        """
+
+        self.executor.shutdown(wait=True)
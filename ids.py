@@ -0,0 +1,92 @@
+from os import urandom
+from time import time_ns
+from typing import Optional, Union
+from uuid import UUID
+
+
+def uuid7() -> UUID:
+    """
+    Time-ordered UUID (RFC 9562, version 7): 48 bits of unix milliseconds and 74 random bits.
+    New rows land at the end of the primary key index instead of at random pages.
+
+    :returns: new uuid
+    :rtype: UUID
+    """
+
+    value = (time_ns() // 1_000_000) << 80 | int.from_bytes(urandom(10), "big")
+
+    # version 7 in bits 76-79, variant 0b10 in bits 62-63
+    value = value & ~(0xF << 76) | 0x7 << 76
+    value = value & ~(0x3 << 62) | 0x2 << 62
+
+    return UUID(int=value)
+
+
+def to_bytes(value: Union[str, UUID, bytes, None]) -> Optional[bytes]:
+    """
+    Converts an id to the 16 bytes stored in BINARY(16) columns
+
+    :param value: canonical string, UUID or bytes
+    :type value: Union[str, UUID, bytes]
+
+    :returns: bytes or None if value is not a valid uuid, so the query matches nothing
+    :rtype: Optional[bytes]
+    """
+
+    if isinstance(value, UUID):
+        return value.bytes
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value) if len(value) == 16 else None
+
+    try:
+        return UUID(str(value)).bytes
+    except ValueError:
+        return None
+
+
+def from_bytes(value: Union[bytes, bytearray]) -> str:
+    """
+    Converts 16 bytes of a BINARY(16) column to the canonical string
+
+    :param value: stored id
+    :type value: bytes
+
+    :returns: id like "bc6554dd-017d-4d7e-8301-aa204b601161"
+    :rtype: str
+    """
+
+    return str(UUID(bytes=bytes(value)))
+
+
+def decode_row(row: tuple) -> tuple:
+    """
+    Replaces 16 byte values of a row with canonical id strings.
+    Ids are the only binary columns of the schema.
+
+    :param row: fetched row
+    :type row: tuple
+
+    :returns: row with string ids
+    :rtype: tuple
+    """
+
+    return tuple(
+        from_bytes(value) if isinstance(value, (bytes, bytearray)) and len(value) == 16 else value
+        for value in row
+    )
+
+
+def canonical(value: Union[str, UUID, bytes, None]) -> Optional[str]:
+    """
+    Canonical string of an id in any spelling (upper case, without hyphens, in braces),
+    used as the key of caches and change notifications
+
+    :param value: id
+    :type value: Union[str, UUID, bytes]
+
+    :returns: id like "bc6554dd-017d-4d7e-8301-aa204b601161" or None if value is not a valid uuid
+    :rtype: Optional[str]
+    """
+
+    value = to_bytes(value)
+    return from_bytes(value) if value is not None else None
@@ -1,66 +1,179 @@
 from db import *
 from logger import Logger
+from config import get_conf, get_queries, load_json
 
+from argparse import ArgumentParser
+
+
+conf = get_conf()
+sql = get_queries()
+
+init_logger = Logger(conf["logger"]["init"], **conf["logger"]["settings"])
 
-conf = load(open("confs/conf.json", encoding="utf-8"))
-sql = load(open(conf["db"]["queries"], encoding="utf-8"))
 
-init_logger = Logger(conf["logger"]["init"])
+class MigrationRunner:
+    """
+        Applies versioned schema migrations and records them in schema_migrations
 
+        :param mariamanager: connection to the database that is migrated
+        :type mariamanager: MariaConnection
 
-mariamanager = MariaConnection(
-    host=conf["db"]["conn"]["host"],
-    port=conf["db"]["conn"]["port"],
-    user=conf["db"]["conn"]["user"],
-    password=conf["db"]["conn"]["password"],
-    database=conf["db"]["conn"]["database"]
-)
+        :param migrations: list of {"version", "name", "statements"} ordered by version
+        :type migrations: list
+    """
 
-
-try:
-    init_logger.log(
-        status="l", 
-        message="Initializing users"
-    )
-
-    mariamanager._execute(
-        query=sql["init_users"],
-        data=[]
-    )
-
-    init_logger.log(
-        status="l",
-        message="Users are successfully initialized"
-    )
-
-except Exception as e:
-    init_logger.log(
-        status="f", 
-        message=f"Initialization failed! Full exception {e}"
+    def __init__(
+            self,
+            mariamanager: MariaConnection,
+            migrations: list
+        ) -> None:
+
+        self.mariamanager = mariamanager
+        self.migrations = sorted(migrations, key=lambda migration: migration["version"])
+
+    def applied(self) -> List[int]:
+        """
+        Versions that are already applied
+
+        :returns: list of versions
+        :rtype: List[int]
+        """
+
+        with self.mariamanager.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql["init_migrations"])
+                cursor.execute(sql["get_migrations"])
+                return [row[0] for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+
+    def pending(self) -> list:
+        """
+        Migrations that are not applied yet
+
+        :returns: list of migrations
+        :rtype: list
+        """
+
+        applied = set(self.applied())
+        return [migration for migration in self.migrations if migration["version"] not in applied]
+
+    def apply(
+            self,
+            migration: Dict
+        ) -> None:
+        """
+        Runs every statement of one migration and records its version.
+
+        Where DDL is transactional (SQLite) the statements and the record run in one
+        transaction, so a failed migration leaves the schema as it was. MariaDB commits
+        every DDL statement, so its migrations are split into versions that are either
+        a single statement or safe to run again from the start.
+
+        :param migration: migration to apply
+        :type migration: Dict
+        """
+
+        transactional = self.mariamanager.backend.transactional_ddl
+
+        with self.mariamanager.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if transactional:
+                    cursor.execute("BEGIN;")
+
+                for statement in migration["statements"]:
+                    cursor.execute(statement)
+
+                cursor.execute(
+                    sql["add_migration"],
+                    (migration["version"], migration["name"], datetime.now())
+                )
+
+                if transactional:
+                    conn.commit()
+            except Exception:
+                if transactional:
+                    conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def upgrade(
+            self,
+            target: Optional[int] = None
+        ) -> int:
+        """
+        Applies pending migrations in order
+
+        :param target: last version to apply, defaults to the newest one
+        :type target: int
+
+        :returns: number of applied migrations
+        :rtype: int
+        """
+
+        count = 0
+
+        for migration in self.pending():
+            if target is not None and migration["version"] > target:
+                break
+
+            init_logger.log(
+                status="l",
+                message=f"Applying migration {migration['version']} ({migration['name']})"
+            )
+
+            try:
+                self.apply(migration)
+            except Exception as e:
+                init_logger.log(
+                    status="f",
+                    message=f"Migration {migration['version']} failed! Full exception {e}"
+                )
+                raise
+
+            init_logger.log(
+                status="l",
+                message=f"Migration {migration['version']} is successfully applied"
+            )
+
+            count += 1
+
+        return count
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Applies database migrations")
+    parser.add_argument("--target", type=int, default=None, help="last version to apply")
+    parser.add_argument("--list", action="store_true", help="only show pending migrations")
+    args = parser.parse_args()
+
+    mariamanager = MariaConnection(
+        host=conf["db"]["conn"]["host"],
+        port=conf["db"]["conn"]["port"],
+        user=conf["db"]["conn"]["user"],
+        password=conf["db"]["conn"]["password"],
+        database=conf["db"]["conn"]["database"],
+        pool=conf["db"]["pool"],
+        backend=conf["db"]["backend"],
+        sqlite=conf["db"]["sqlite"],
+        uuid_version=conf["db"]["uuid_version"]
     )
 
-try:
-    init_logger.log(
-        status="l", 
-        message="Initializing posts"
+    runner = MigrationRunner(
+        mariamanager=mariamanager,
+        migrations=load_json(conf["db"]["migrations"][conf["db"]["backend"]])
     )
 
-    mariamanager._execute(
-        query=sql["init_posts"],
-        data=[]
-    )
-
-    init_logger.log(
-        status="l",
-        message="Posts are successfully initialized"
-    )
-
-except Exception as e:
-    init_logger.log(
-        status="f", 
-        message=f"Initialization failed! Full exception {e}"
-    )
-
-    
-    
-
+    if args.list:
+        for migration in runner.pending():
+            print(f"{migration['version']}: {migration['name']}")
+    else:
+        try:
+            applied = runner.upgrade(target=args.target)
+            print(f"Applied {applied} migration(s)")
+        except Exception as e:
+            print(f"Migration failed, see {conf['logger']['init']}: {e}")
+            exit(1)
@@ -1,32 +1,96 @@
-from os import path, getpid
+from os import makedirs, path, getpid
 from datetime import datetime
+from queue import Queue, Empty, Full
+from threading import Thread, Lock
+from time import monotonic
+
+import atexit
 
 logs_init_msg = "=" * 5 + f"FILE CREATED {datetime.now()}" + "=" * 5 + "\n"
 
+status_val = {
+    "d": "DEBUG",
+    "l": "LOG",
+    "e": "ERROR",
+    "f": "FATAL"
+}
+
+status_level = {
+    "d": 0,
+    "l": 1,
+    "e": 2,
+    "f": 3
+}
+
+_stop = object()
+
 class Logger:
     filepath: str
 
     def __init__(self,
-                 filepath: str
+                 filepath: str,
+                 level: str = "d",
+                 buffered: bool = False,
+                 queue_size: int = 10000,
+                 batch_size: int = 256,
+                 flush_interval: float = 0.5
                  ) -> None:
         """
         A class that enables logging in the project
-        
+
+        In buffered mode log() only puts the line into a queue and a background
+        thread writes lines in batches, when batch_size lines are collected or
+        flush_interval seconds passed since the first one, and on close().
+        If the queue is full new lines are dropped and counted.
+
         :param filepath: the path of logs file
         :type filepath: str
+
+        :param level: minimum status that is written: d, l, e or f
+        :type level: str
+
+        :param buffered: write from a background thread instead of the calling one
+        :type buffered: bool
+
+        :param queue_size: maximum number of lines waiting to be written
+        :type queue_size: int
+
+        :param batch_size: number of lines written at once
+        :type batch_size: int
+
+        :param flush_interval: maximum seconds a line waits in the queue
+        :type flush_interval: float
         """
         self.filepath = filepath
+        self.level = status_level[level]
+        self.buffered = buffered
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pid = f"{str(getpid()):^5}"
+
+        self.dropped = 0
+        self.written = 0
+        self._lock = Lock()
 
         if not path.exists(path=self.filepath):
+            # logs/ is not in the repository
+            makedirs(path.dirname(self.filepath) or ".", exist_ok=True)
             self.file = open(file=self.filepath, mode="a+", encoding="utf-8")
             self.file.write(logs_init_msg)
-        else: 
+        else:
             self.file = open(file=self.filepath, mode="a+", encoding="utf-8")
-        
+
+        self._writer = None
+        if self.buffered:
+            self._queue = Queue(maxsize=queue_size)
+            self._writer = Thread(target=self._write_loop, name=f"logger:{self.filepath}", daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+
     def log(self,
             status: str,
             message: str) -> None:
-        
+
         status: str
         message: str
 
@@ -35,20 +99,81 @@ class Logger:
 
         :param status: d - debug, l - log, e - error, f - fatal
         :type status: str
-        
+
         :param message: any text
         :type message: str
         """
-        status_val = {
-            "d": "DEBUG",
-            "l": "LOG",
-            "e": "ERROR",
-            "f": "FATAL"
-        }
+        if status_level.get(status, 3) < self.level:
+            return
 
-        if status in status_val.keys():
-            self.file.write(f"({datetime.now()}) [{str(getpid()):^5}] |{status_val[status]}| -> {message}\n")
-        else:
-            self.file.write(f"({datetime.now()}) [{str(getpid()):^5}] |{status.upper()}| -> {message}\n")
+        line = f"({datetime.now()}) [{self.pid}] |{status_val.get(status) or status.upper()}| -> {message}\n"
+
+        if self.buffered:
+            try:
+                self._queue.put_nowait(line)
+            except Full:
+                with self._lock:
+                    self.dropped += 1
+            return
+
+        with self._lock:
+            self.file.write(line)
+            self.file.flush()
+            self.written += 1
+
+    def _write(self, batch: list) -> None:
+        with self._lock:
+            self.file.write("".join(batch))
+            self.file.flush()
+            self.written += len(batch)
+
+    def _write_loop(self) -> None:
+        batch = []
+        deadline = None
+
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - monotonic())
+
+            try:
+                line = self._queue.get(timeout=timeout)
+            except Empty:
+                line = None
+
+            if line is _stop:
+                if batch:
+                    self._write(batch)
+                return
+
+            if line is not None:
+                batch.append(line)
+                if deadline is None:
+                    deadline = monotonic() + self.flush_interval
 
-        self.file.flush()
+            if batch and (line is None or len(batch) >= self.batch_size):
+                self._write(batch)
+                batch = []
+                deadline = None
+
+    def close(self) -> None:
+        """
+        Writes everything that is queued and stops the background thread
+        """
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(_stop)
+            self._writer.join()
+
+        with self._lock:
+            self.file.flush()
+
+    def stats(self) -> dict:
+        """
+        Logger counters
+
+        :returns: number of written and dropped lines
+        :rtype: dict
+        """
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize() if self.buffered else 0
+        }
@@ -0,0 +1,411 @@
+from bisect import bisect_left
+from threading import Lock, local
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.routing import Match
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(
+            self,
+            registry: "MetricsRegistry",
+            name: str,
+            help: str,
+            labels: Tuple[str, ...] = ()
+        ) -> None:
+
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+
+class Counter(_Metric):
+    """
+        Monotonic counter
+    """
+
+    kind = "counter"
+
+    def inc(
+            self,
+            *labels,
+            amount: float = 1
+        ) -> None:
+        """
+        Adds amount to the counter
+
+        :param labels: label values in the order of the metric's label names
+        :param amount: value to add
+        :type amount: float
+        """
+
+        shard = self.registry._shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    """
+        Value that goes up and down (ex. requests in flight)
+    """
+
+    kind = "gauge"
+
+    def dec(
+            self,
+            *labels,
+            amount: float = 1
+        ) -> None:
+        """
+        Subtracts amount from the gauge
+
+        :param labels: label values in the order of the metric's label names
+        :param amount: value to subtract
+        :type amount: float
+        """
+
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """
+        Distribution of observed values in fixed buckets
+    """
+
+    kind = "histogram"
+
+    def __init__(
+            self,
+            registry: "MetricsRegistry",
+            name: str,
+            help: str,
+            labels: Tuple[str, ...] = (),
+            buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+        ) -> None:
+
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(
+            self,
+            value: float,
+            *labels
+        ) -> None:
+        """
+        Records one value
+
+        :param value: observed value, seconds for latencies
+        :type value: float
+
+        :param labels: label values in the order of the metric's label names
+        """
+
+        shard = self.registry._shard()
+        key = (self.name, labels)
+
+        counts = shard.get(key)
+        if counts is None:
+            # one slot per bucket, one for +Inf and the running sum
+            counts = shard[key] = [0] * (len(self.buckets) + 2)
+
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def time(self, *labels) -> "_Timer":
+        """
+        Context manager that observes the time spent inside it
+
+        :param labels: label values in the order of the metric's label names
+        """
+
+        return _Timer(self, labels)
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Tuple) -> None:
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(perf_counter() - self.started, *self.labels)
+
+
+class MetricsRegistry:
+    """
+        Collection of metrics rendered in Prometheus text format.
+
+        Every thread updates its own shard of values, so recording a value never
+        takes a shared lock; shards are only merged when the metrics are rendered.
+        Collectors are callables that report values owned by other objects
+        (pool, caches, loggers) at render time.
+    """
+
+    def __init__(self) -> None:
+        self._local = local()
+        self._shards: List[Dict] = []
+        self._lock = Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable] = []
+
+    def _shard(self) -> Dict:
+        shard = getattr(self._local, "shard", None)
+
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+
+        return shard
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                return self._metrics[metric.name]
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(self, name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(self, name, help, labels))
+
+    def histogram(
+            self,
+            name: str,
+            help: str,
+            labels: Tuple[str, ...] = (),
+            buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+        ) -> Histogram:
+        return self._register(Histogram(self, name, help, labels, buckets))
+
+    def collector(
+            self,
+            func: Callable[[], Iterable[Tuple[str, str, str, Tuple[str, ...], List[Tuple[Tuple, float]]]]]
+        ) -> None:
+        """
+        Registers a callable that returns (name, type, help, label names, [(label values, value)]) tuples
+
+        :param func: collector
+        :type func: Callable
+        """
+
+        with self._lock:
+            self._collectors.append(func)
+
+    def stats_collector(
+            self,
+            prefix: str,
+            help: str,
+            func: Callable[[], Dict],
+            label: Optional[str] = None
+        ) -> None:
+        """
+        Exports a stats() dictionary as gauges named prefix_key.
+        With label the dictionary is {label value: stats}, ex. cache_stats().
+
+        :param prefix: metric name prefix
+        :type prefix: str
+
+        :param help: help text
+        :type help: str
+
+        :param func: callable returning the stats dictionary
+        :type func: Callable
+
+        :param label: name of the label for nested dictionaries
+        :type label: str
+        """
+
+        def collect():
+            stats = func()
+            groups = stats.items() if label else [((), stats)]
+            series: Dict[str, List] = {}
+
+            for group, values in groups:
+                labels = (group,) if label else ()
+                for key, value in values.items():
+                    if isinstance(value, (int, float)):
+                        series.setdefault(key, []).append((labels, value))
+
+            return [
+                (f"{prefix}_{key}", "gauge", f"{help} ({key})", (label,) if label else (), samples)
+                for key, samples in series.items()
+            ]
+
+        self.collector(collect)
+
+    def _merged(self) -> Dict:
+        with self._lock:
+            shards = list(self._shards)
+
+        merged: Dict = {}
+
+        for shard in shards:
+            for key, value in shard.copy().items():
+                if isinstance(value, list):
+                    total = merged.get(key)
+                    if total is None:
+                        merged[key] = list(value)
+                    else:
+                        for i, item in enumerate(value):
+                            total[i] += item
+                else:
+                    merged[key] = merged.get(key, 0) + value
+
+        return merged
+
+    def render(self) -> str:
+        """
+        Renders every metric in Prometheus text exposition format
+
+        :returns: metrics text
+        :rtype: str
+        """
+
+        merged = self._merged()
+        lines = []
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        series: Dict[str, List] = {}
+        for (name, labels), value in merged.items():
+            series.setdefault(name, []).append((labels, value))
+
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+
+            for labels, value in sorted(series.get(metric.name, [])):
+                if metric.kind != "histogram":
+                    lines.append(f"{metric.name}{_labels(metric.labels, labels)} {_number(value)}")
+                    continue
+
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), value[:-1]):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                    lines.append(f"{metric.name}_bucket{_labels(metric.labels, labels, le)} {cumulative}")
+
+                lines.append(f"{metric.name}_sum{_labels(metric.labels, labels)} {_number(value[-1])}")
+                lines.append(f"{metric.name}_count{_labels(metric.labels, labels)} {cumulative}")
+
+        for collect in collectors:
+            for name, kind, help, label_names, samples in collect():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(label_names, labels)} {_number(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+        ASGI middleware that counts requests and measures their latency per route.
+        Routes are labelled by their path template (/api/posts/{id}), not by the raw path.
+
+        :param app: wrapped ASGI app
+        :param registry: registry to record into
+        :type registry: MetricsRegistry
+    """
+
+    def __init__(
+            self,
+            app,
+            registry: MetricsRegistry
+        ) -> None:
+
+        self.app = app
+
+        self.requests = registry.counter(
+            "blog_http_requests_total",
+            "HTTP requests by method, route and status",
+            ("method", "route", "status")
+        )
+        self.in_flight = registry.gauge(
+            "blog_http_requests_in_flight",
+            "HTTP requests being handled by method and route",
+            ("method", "route")
+        )
+        self.latency = registry.histogram(
+            "blog_http_request_duration_seconds",
+            "HTTP request latency by method and route",
+            ("method", "route")
+        )
+
+    @staticmethod
+    def _route(scope) -> str:
+        # the router sets scope["route"] only once the request reaches it, the in-flight
+        # gauge needs the route before that, so it is matched the way the router does
+        partial = None
+
+        for route in getattr(scope.get("app"), "routes", ()):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+            if match == Match.PARTIAL and partial is None:
+                partial = route.path
+
+        return partial or "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route(scope)
+        status = 500
+        started = perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.in_flight.inc(method, route)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.in_flight.dec(method, route)
+
+            self.requests.inc(method, route, str(status))
+            self.latency.observe(perf_counter() - started, method, route)
+
+
+registry = MetricsRegistry()
@@ -11,6 +11,24 @@ class InvalidMariaArguments(Exception):
 
         super().__init__(f"Invalid Maria Arguments! The connection establishing was failed! Full exception {message}")
 
+
+class PoolTimeout(Exception):
+    def __init__(
+            self, 
+            message: str
+        ) -> None:
+
+        super().__init__(f"Connection pool is exhausted! Full exception {message}")
+
+
+class ReadFailed(Exception):
+    def __init__(
+            self, 
+            message: str
+        ) -> None:
+
+        super().__init__(f"Reading from the database failed! Full exception {message}")
+
 class User(BaseModel):
     """
         User class
@@ -86,4 +104,40 @@ class Post(BaseModel):
     title: str
     content: str
     createdAt: datetime
-    updatedAt: datetime
\ No newline at end of file
+    updatedAt: datetime
+
+
+class UserCreate(BaseModel):
+    """
+    One user of a batch create request
+
+    :param email: user's email
+    :type email: str
+
+    :param login: user's login
+    :type login: str
+
+    :param password: unhashed password
+    :type password: str
+    """
+    email: str
+    login: str
+    password: str
+
+
+class PostCreate(BaseModel):
+    """
+    One post of a batch create request
+
+    :param authorId: author's id
+    :type authorId: str
+
+    :param title: post's title
+    :type title: str
+
+    :param content: post's content
+    :type content: str
+    """
+    authorId: str
+    title: str
+    content: str
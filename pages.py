@@ -0,0 +1,304 @@
+from gzip import compress
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from fastapi import Request, Response
+from jinja2 import Environment
+from markupsafe import Markup
+
+from cache import LRUCache, MISSING
+
+
+def accepted_encodings(header: Optional[str]) -> Set[str]:
+    """
+    Content codings from an Accept-Encoding header, without the ones refused with q=0
+
+    :param header: Accept-Encoding value
+    :type header: str
+
+    :returns: set of lowercase codings
+    :rtype: Set[str]
+    """
+
+    encodings = set()
+
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+
+        if q > 0:
+            encodings.add(coding)
+
+    return encodings
+
+
+class CachedPage:
+    """
+        Rendered page: final HTML bytes and, optionally, their gzipped copy
+    """
+
+    __slots__ = ("body", "gzipped", "status_code", "media_type")
+
+    def __init__(
+            self,
+            body: bytes,
+            gzipped: Optional[bytes],
+            status_code: int,
+            media_type: str
+        ) -> None:
+
+        self.body = body
+        self.gzipped = gzipped
+        self.status_code = status_code
+        self.media_type = media_type
+
+    def response(self, request: Request) -> Response:
+        """
+        Response for one request, gzipped if the client accepts it
+
+        :param request: incoming request
+        :type request: Request
+
+        :returns: response
+        :rtype: Response
+        """
+
+        if self.gzipped is not None and "gzip" in accepted_encodings(request.headers.get("accept-encoding")):
+            return Response(
+                self.gzipped,
+                status_code=self.status_code,
+                media_type=self.media_type,
+                headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
+            )
+
+        return Response(
+            self.body,
+            status_code=self.status_code,
+            media_type=self.media_type,
+            headers={"Vary": "Accept-Encoding"} if self.gzipped is not None else None
+        )
+
+
+class PageCache:
+    """
+        Cache of rendered HTML pages keyed by (page, id).
+
+        Templates render links without the host (see assets.static_url_for), so
+        one page per key serves every Host. Pages are dropped by invalidate_table(), which is
+        registered with MariaConnection.on_change(), so a write made through the
+        app is visible on the next page view; the TTL only bounds writes made
+        around the app.
+
+        :param maxsize: maximum number of cached keys
+        :type maxsize: int
+
+        :param ttl: seconds a page lives in the cache
+        :type ttl: float
+
+        :param gzip: also store a gzipped copy of every page
+        :type gzip: bool
+
+        :param gzip_level: gzip compression level, 1-9
+        :type gzip_level: int
+    """
+
+    # table -> (listing page, single row page)
+    pages = {
+        "users": ("users", "user"),
+        "posts": ("posts", "post"),
+    }
+
+    def __init__(
+            self,
+            maxsize: int = 1024,
+            ttl: float = 300.0,
+            gzip: bool = True,
+            gzip_level: int = 6
+        ) -> None:
+
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl, negative_ttl=0)
+        self.gzip = gzip
+        self.gzip_level = gzip_level
+
+    def get(
+            self,
+            key: Tuple[str, Hashable]
+        ) -> Optional[CachedPage]:
+        """
+        Looks a page up
+
+        :param key: (page, id), id is None for listings
+        :type key: Tuple[str, Hashable]
+
+        :returns: cached page or None
+        :rtype: Optional[CachedPage]
+        """
+
+        page = self.cache.get(key)
+        return None if page is MISSING else page
+
+    def token(self) -> int:
+        """
+        Token to pass to store(), taken before the page data is read
+        """
+
+        return self.cache.token()
+
+    def store(
+            self,
+            key: Tuple[str, Hashable],
+            response: Response,
+            token: int
+        ) -> CachedPage:
+        """
+        Stores a rendered response. Nothing is stored if the cache was invalidated after token() was taken.
+
+        :param key: (page, id), id is None for listings
+        :type key: Tuple[str, Hashable]
+
+        :param response: rendered response, ex. TemplateResponse
+        :type response: Response
+
+        :param token: token got before the page data was read
+        :type token: int
+
+        :returns: cached page
+        :rtype: CachedPage
+        """
+
+        body = bytes(response.body)
+        page = CachedPage(
+            body=body,
+            gzipped=compress(body, compresslevel=self.gzip_level) if self.gzip else None,
+            status_code=response.status_code,
+            media_type=response.headers.get("content-type", "text/html; charset=utf-8")
+        )
+
+        self.cache.set(key, page, token=token)
+
+        return page
+
+    def invalidate_table(
+            self,
+            table: str,
+            ids: Iterable[str]
+        ) -> None:
+        """
+        Drops the listing page of a table and the pages of the given rows
+
+        :param table: "users" or "posts"
+        :type table: str
+
+        :param ids: ids of changed rows
+        :type ids: Iterable[str]
+        """
+
+        listing, single = self.pages[table]
+        self.cache.invalidate((listing, None), *((single, str(id)) for id in ids))
+
+    def stats(self) -> Dict:
+        """
+        Cache statistics
+
+        :returns: dictionary with counters and current size
+        :rtype: Dict
+        """
+
+        return self.cache.stats()
+
+
+class FragmentCache:
+    """
+        Cache of one rendered template fragment per row, ex. a post card on /posts.
+
+        Entries are keyed on the row id and hold the updatedAt they were rendered
+        for, so a changed row is rendered again; invalidate_table() drops rows that
+        changed within the same second, which updatedAt can't tell apart.
+        Registered in the environment as a global, the template calls it like
+        {{ post_card(post) }}.
+
+        :param env: environment to load the fragment template from
+        :type env: Environment
+
+        :param table: table the rows come from, ex. "posts"
+        :type table: str
+
+        :param template: fragment template name
+        :type template: str
+
+        :param name: name the row has inside the fragment template
+        :type name: str
+
+        :param maxsize: maximum number of cached fragments
+        :type maxsize: int
+
+        :param ttl: seconds a fragment lives in the cache
+        :type ttl: float
+    """
+
+    def __init__(
+            self,
+            env: Environment,
+            table: str,
+            template: str,
+            name: str,
+            maxsize: int = 10000,
+            ttl: float = 3600.0
+        ) -> None:
+
+        self.env = env
+        self.table = table
+        self.template = template
+        self.name = name
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl, negative_ttl=0)
+
+    def __call__(self, row: Dict) -> Markup:
+        key = str(row["id"])
+
+        cached = self.cache.get(key)
+        if cached is not MISSING and cached[0] == row["updatedAt"]:
+            return cached[1]
+
+        token = self.cache.token()
+        fragment = Markup(self.env.get_template(self.template).render({self.name: row}))
+        self.cache.set(key, (row["updatedAt"], fragment), token=token)
+
+        return fragment
+
+    def invalidate_table(
+            self,
+            table: str,
+            ids: Iterable[str]
+        ) -> None:
+        """
+        Drops fragments of changed rows, changes of other tables are ignored
+
+        :param table: table the rows belong to
+        :type table: str
+
+        :param ids: ids of changed rows
+        :type ids: Iterable[str]
+        """
+
+        if table == self.table:
+            self.cache.invalidate(*(str(id) for id in ids))
+
+    def stats(self) -> Dict:
+        """
+        Cache statistics
+
+        :returns: dictionary with counters and current size
+        :rtype: Dict
+        """
+
+        return self.cache.stats()
@@ -0,0 +1,48 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from json import dumps, loads
+from typing import Tuple
+
+
+def encode_cursor(
+        created_at: datetime,
+        id: str
+    ) -> str:
+    """
+    Packs the keyset of the last row of a page into an opaque cursor
+
+    :param created_at: createdAt of the last row
+    :type created_at: datetime
+
+    :param id: id of the last row
+    :type id: str
+
+    :returns: url-safe cursor
+    :rtype: str
+    """
+
+    raw = dumps([created_at.isoformat(), str(id)], separators=(",", ":"))
+    return urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(
+        cursor: str
+    ) -> Tuple[datetime, str]:
+    """
+    Unpacks a cursor made by encode_cursor
+
+    :param cursor: cursor got from a previous page
+    :type cursor: str
+
+    :returns: (createdAt, id) keyset to continue after
+    :rtype: Tuple[datetime, str]
+
+    :raises ValueError: if the cursor is malformed
+    """
+
+    try:
+        raw = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = loads(raw.decode("utf-8"))
+        return datetime.fromisoformat(created_at), str(id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor {cursor!r}") from e
@@ -0,0 +1,200 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import count
+from threading import Lock
+from time import monotonic
+from typing import Dict, Iterator, List, Optional, Set
+
+from starlette.requests import cookie_parser
+
+
+# set for a request that must read from the primary: it writes or its client wrote recently.
+# AsyncMariaConnection.run copies the context, so the executor thread sees it
+read_from_primary: ContextVar[bool] = ContextVar("read_from_primary", default=False)
+
+# tables read from a replica inside track_replica_reads(), the set is shared with the executor thread
+replica_reads: ContextVar[Optional[Set[str]]] = ContextVar("replica_reads", default=None)
+
+
+@contextmanager
+def track_replica_reads() -> Iterator[Set[str]]:
+    """
+    Collects the tables that queries inside the block read from a replica,
+    so a cache can tell whether what it's about to store may be behind the primary.
+
+        with track_replica_reads() as reads:
+            data = self._execute(query, data, read_table="users")
+        if self.cacheable(reads):
+            cache.set(...)
+
+    :returns: set of table names, filled while the block runs
+    :rtype: Iterator[Set[str]]
+    """
+
+    reads: Set[str] = set()
+    token = replica_reads.set(reads)
+
+    try:
+        yield reads
+    finally:
+        replica_reads.reset(token)
+
+
+class ReplicaSet:
+    """
+        Read replicas picked round-robin. A replica whose connection failed is
+        ejected for eject_seconds and then gets traffic again.
+
+        :param pools: one ConnectionPool per replica
+        :type pools: List[ConnectionPool]
+
+        :param names: replica names for logs and metrics, ex. "db2:3306"
+        :type names: List[str]
+
+        :param eject_seconds: how long a failed replica gets no reads
+        :type eject_seconds: float
+    """
+
+    def __init__(
+            self,
+            pools: List,
+            names: List[str],
+            eject_seconds: float = 30.0
+        ) -> None:
+
+        self.pools = pools
+        self.names = names
+        self.eject_seconds = eject_seconds
+
+        self._next = count()
+        self._lock = Lock()
+        self._ejected_until = [0.0] * len(pools)
+        self._stats = [{"reads": 0, "ejections": 0} for _ in pools]
+
+    def __len__(self) -> int:
+        return len(self.pools)
+
+    def choose(self) -> Optional[int]:
+        """
+        Next healthy replica
+
+        :returns: index of the replica, None if there are none or all are ejected
+        :rtype: Optional[int]
+        """
+
+        if not self.pools:
+            return None
+
+        now = monotonic()
+        start = next(self._next)
+
+        for i in range(len(self.pools)):
+            index = (start + i) % len(self.pools)
+            if self._ejected_until[index] <= now:
+                with self._lock:
+                    self._stats[index]["reads"] += 1
+                return index
+
+        return None
+
+    def eject(self, index: int) -> None:
+        """
+        Stops sending reads to a replica for eject_seconds and drops its idle connections
+
+        :param index: index of the replica
+        :type index: int
+        """
+
+        with self._lock:
+            self._ejected_until[index] = monotonic() + self.eject_seconds
+            self._stats[index]["ejections"] += 1
+
+        self.pools[index].close()
+
+    def close(self) -> None:
+        """
+        Closes idle connections of every replica
+        """
+
+        for pool in self.pools:
+            pool.close()
+
+    def stats(self) -> Dict:
+        """
+        Statistics per replica
+
+        :returns: {name: {"reads", "ejections", "ejected", pool counters}}
+        :rtype: Dict
+        """
+
+        now = monotonic()
+
+        with self._lock:
+            return {
+                name: {
+                    **self._stats[index],
+                    "ejected": int(self._ejected_until[index] > now),
+                    **self.pools[index].stats()
+                }
+                for index, name in enumerate(self.names)
+            }
+
+
+class ReadYourWritesMiddleware:
+    """
+        ASGI middleware that sends reads of a client to the primary for a while after it wrote.
+
+        A successful POST/PUT/PATCH/DELETE sets a cookie that lives sticky_seconds;
+        requests carrying it, and the writing requests themselves, read from the
+        primary, so a client sees its own changes even if the replicas lag behind
+        or its next request goes to another worker.
+
+        :param app: wrapped ASGI app
+        :param sticky_seconds: lifetime of the cookie
+        :type sticky_seconds: float
+        :param cookie: name of the cookie
+        :type cookie: str
+    """
+
+    safe_methods = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(
+            self,
+            app,
+            sticky_seconds: float = 5.0,
+            cookie: str = "blog_primary"
+        ) -> None:
+
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+        self.cookie = cookie
+
+    def _sticky(self, scope) -> bool:
+        # starlette's parser skips malformed cookies instead of stopping at them
+        for name, value in scope["headers"]:
+            if name == b"cookie" and self.cookie in cookie_parser(value.decode("latin-1")):
+                return True
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        writes = scope["method"] not in self.safe_methods
+
+        if not writes and not self._sticky(scope):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and writes and message["status"] < 400:
+                cookie = f"{self.cookie}=1; Max-Age={int(self.sticky_seconds)}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        token = read_from_primary.set(True)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            read_from_primary.reset(token)
@@ -0,0 +1,93 @@
+from dataclasses import make_dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence, Tuple
+
+
+def _getitem(self, key: str) -> Any:
+    try:
+        return getattr(self, key)
+    except AttributeError:
+        raise KeyError(key) from None
+
+
+def _get(self, key: str, default: Any = None) -> Any:
+    return getattr(self, key, default)
+
+
+@lru_cache(maxsize=None)
+def record_type(columns: Tuple[str, ...]) -> type:
+    """
+    Record class for one set of columns, created once and reused for every query that returns them.
+
+    Records are dataclasses with __slots__, so a row takes about a third of the
+    memory of a dict and orjson serializes it as an object natively. They also
+    support record["column"] and record.get("column") like the dicts they replace.
+
+    :param columns: column names in the order of the cursor
+    :type columns: Tuple[str, ...]
+
+    :returns: record class, construct it with the row values
+    :rtype: type
+    """
+
+    return make_dataclass(
+        "Record",
+        columns,
+        slots=True,
+        namespace={"__getitem__": _getitem, "get": _get}
+    )
+
+
+def column_names(description: Sequence) -> Tuple[str, ...]:
+    """
+    Column names from cursor.description
+
+    :param description: cursor.description
+    :type description: Sequence
+
+    :returns: names
+    :rtype: Tuple[str, ...]
+    """
+
+    return tuple(column[0] for column in description)
+
+
+def to_records(
+        columns: Tuple[str, ...],
+        rows: List[tuple]
+    ) -> list:
+    """
+    Maps fetched rows to records by column name
+
+    :param columns: column names from column_names()
+    :type columns: Tuple[str, ...]
+
+    :param rows: fetched rows
+    :type rows: List[tuple]
+
+    :returns: list of records
+    :rtype: list
+    """
+
+    record = record_type(columns)
+    return [record(*row) for row in rows]
+
+
+def compact(
+        columns: Tuple[str, ...],
+        rows: List[tuple]
+    ) -> Dict:
+    """
+    Rows passed to the serializer as they are: {"columns": [...], "rows": [[...], ...]}
+
+    :param columns: column names from column_names()
+    :type columns: Tuple[str, ...]
+
+    :param rows: fetched rows
+    :type rows: List[tuple]
+
+    :returns: compact listing
+    :rtype: Dict
+    """
+
+    return {"columns": list(columns), "rows": rows}
@@ -0,0 +1,97 @@
+"""
+Runs the app in several worker processes
+
+    python serve.py                  # one worker per CPU core
+    python serve.py --workers 4 --port 8000
+
+db.pool and db.executor in conf.json are the budget of the whole server and
+are split between the workers, so the database sees the same number of
+connections however many workers there are; there are never more workers than
+db.pool.size, every one needs a connection of its own.
+
+Every worker has its own caches and a write only invalidates the caches of the
+worker that made it, so with several workers cached rows and pages live at most
+server.cache_ttl seconds. Every worker writes its own log
+files (the pid is added before the extension), because separate processes
+appending to one file through their own buffers interleave partial batches.
+
+Send SIGHUP to the launcher to reload gracefully: workers are replaced one by
+one, each finishing its requests first, and the new ones read conf.json again.
+The launcher is a supervisor process even with a single worker, so this works
+for --workers 1 too.
+"""
+
+from argparse import ArgumentParser
+from os import cpu_count, environ
+from typing import Dict
+
+from config import get_conf
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+
+def worker_settings(conf: Dict, workers: int) -> Dict[str, str]:
+    """
+    Environment of a worker with its share of the pool and executor
+
+    :param conf: configuration
+    :type conf: Dict
+
+    :param workers: number of worker processes
+    :type workers: int
+
+    :returns: environment variables read by config.get_conf()
+    :rtype: Dict[str, str]
+    """
+
+    size = max(1, conf["db"]["pool"]["size"] // workers)
+    overflow = conf["db"]["pool"]["overflow"] // workers
+    # a thread without a connection just waits for one, but cache hits don't need it
+    executor = max(size + overflow, conf["db"]["executor"]["workers"] // workers)
+
+    return {
+        "BLOG_POOL_SIZE": str(size),
+        "BLOG_POOL_OVERFLOW": str(overflow),
+        "BLOG_EXECUTOR_WORKERS": str(executor),
+        "BLOG_LOG_PER_PROCESS": "1" if conf["server"]["log_per_worker"] else "0",
+        # another worker's writes don't reach this worker's caches, only expiry does
+        **({"BLOG_CACHE_TTL": str(conf["server"]["cache_ttl"])} if workers > 1 else {}),
+    }
+
+
+def main() -> None:
+    conf = get_conf()
+
+    parser = ArgumentParser(description="Runs the blog with several worker processes")
+    parser.add_argument("--host", default=conf["server"]["host"])
+    parser.add_argument("--port", type=int, default=conf["server"]["port"])
+    parser.add_argument("--workers", type=int, default=conf["server"]["workers"], help="defaults to the number of CPU cores")
+    args = parser.parse_args()
+
+    workers = args.workers or cpu_count() or 1
+
+    if workers > conf["db"]["pool"]["size"]:
+        print(f"{workers} workers need more connections than db.pool.size allows, starting {conf['db']['pool']['size']}")
+        workers = conf["db"]["pool"]["size"]
+
+    # workers are spawned, so they get the settings through the environment
+    environ.update(worker_settings(conf, workers))
+
+    config = uvicorn.Config(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        timeout_graceful_shutdown=conf["server"]["graceful_timeout"],
+        access_log=False
+    )
+    server = uvicorn.Server(config)
+
+    # uvicorn.run() only starts the supervisor, which handles SIGHUP, for more than one worker;
+    # started directly it also keeps a single worker reloadable
+    Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+
+
+if __name__ == "__main__":
+    main()
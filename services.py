@@ -0,0 +1,131 @@
+from db import AsyncMariaConnection
+from models import ReadFailed
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+class BlogService:
+    """
+        Read operations of the HTML pages; the API handlers call the data-access
+        layer themselves. Talks to it directly, without going through HTTP.
+
+        :param mariamanager: async database connection
+        :type mariamanager: AsyncMariaConnection
+
+        :param page_size: number of rows shown on listing pages
+        :type page_size: int
+    """
+
+    def __init__(
+            self,
+            mariamanager: AsyncMariaConnection,
+            page_size: int = 100
+        ) -> None:
+
+        self.mariamanager = mariamanager
+        self.page_size = page_size
+
+    async def list_users(
+            self,
+            after: Optional[Tuple[datetime, str]] = None
+        ) -> Tuple[List[Dict], Optional[Tuple[datetime, str]]]:
+        """
+        One page of users, newest first
+
+        :param after: (createdAt, id) of the last user of the previous page, None for the newest ones
+        :type after: Tuple[datetime, str]
+
+        :returns: list of users and the keyset of the next (older) page, None on the last page
+        :rtype: Tuple[List[Dict], Optional[Tuple[datetime, str]]]
+
+        :raises ReadFailed: if the users couldn't be read
+        """
+
+        try:
+            users, next_key = await self.mariamanager.get_users_page(limit=self.page_size, after=after, newest=True)
+        except Exception as e:
+            raise ReadFailed(str(e)) from e
+
+        if users == ["400"]:
+            raise ReadFailed("get_users_page failed")
+        return users, next_key
+
+    async def get_user(
+            self,
+            id: str
+        ) -> Optional[Dict]:
+        """
+        One user by id
+
+        :param id: user's id
+        :type id: str
+
+        :returns: user or None if it doesn't exist
+        :rtype: Optional[Dict]
+
+        :raises ReadFailed: if the user couldn't be read
+        """
+
+        try:
+            data = await self.mariamanager.get_user(id)
+        except Exception as e:
+            raise ReadFailed(str(e)) from e
+
+        if data and data[0] == "400":
+            raise ReadFailed("get_user failed")
+        if not data or data[0] == "404":
+            return None
+        return data[0]
+
+    async def list_posts(
+            self,
+            after: Optional[Tuple[datetime, str]] = None
+        ) -> Tuple[List[Dict], Optional[Tuple[datetime, str]]]:
+        """
+        One page of posts, newest first
+
+        :param after: (createdAt, id) of the last post of the previous page, None for the newest ones
+        :type after: Tuple[datetime, str]
+
+        :returns: list of posts and the keyset of the next (older) page, None on the last page
+        :rtype: Tuple[List[Dict], Optional[Tuple[datetime, str]]]
+
+        :raises ReadFailed: if the posts couldn't be read
+        """
+
+        try:
+            posts, next_key = await self.mariamanager.get_posts_page(limit=self.page_size, after=after, newest=True)
+        except Exception as e:
+            raise ReadFailed(str(e)) from e
+
+        if posts == ["400"]:
+            raise ReadFailed("get_posts_page failed")
+        return posts, next_key
+
+    async def get_post(
+            self,
+            id: str
+        ) -> Optional[Dict]:
+        """
+        One post by id
+
+        :param id: post's id
+        :type id: str
+
+        :returns: post or None if it doesn't exist
+        :rtype: Optional[Dict]
+
+        :raises ReadFailed: if the post couldn't be read
+        """
+
+        try:
+            data = await self.mariamanager.get_post(id)
+        except Exception as e:
+            raise ReadFailed(str(e)) from e
+
+        if data and data[0] == "400":
+            raise ReadFailed("get_post failed")
+        if not data or data[0] == "404":
+            return None
+        return data[0]